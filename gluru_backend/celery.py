@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from celery.signals import worker_process_shutdown
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gluru_backend.settings')
 
@@ -8,3 +9,9 @@ app.config_from_object('gluru_backend.celeryconfig')
 
 # Load task modules from all registered Django app configs.
 app.autodiscover_tasks()
+
+
+@worker_process_shutdown.connect
+def on_worker_process_shutdown(**kwargs):
+    from gluru_backend.utils import close_mail_connection
+    close_mail_connection()
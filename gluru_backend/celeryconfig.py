@@ -1,15 +1,27 @@
+import environ
 from kombu import Exchange, Queue
 
+env = environ.Env()
+
 broker_url = 'amqp://localhost'
 
 beat_schedule = {
     'email-reminder': {
         'task': 'notification.tasks.email_reminder',
-        'schedule': 5,
+        'schedule': 60,
     },
     'sms-reminder': {
         'task': 'notification.tasks.send_sms',
-        'schedule': 5,
+        'schedule': 60,
+    },
+    'update-search-index': {
+        'task': 'tickets.tasks.update_search_index',
+        'schedule': 5 * 60,
+        'options': {'queue': 'search', 'routing_key': 'search'},
+    },
+    'remove-stale-uploads': {
+        'task': 'tickets.tasks.remove_stale_uploads',
+        'schedule': 60 * 60,
     },
 }
 
@@ -32,10 +44,18 @@ task_queues = (
         routing_key='low',
         queue_arguments={'maxPriority': 1}
     ),
+    Queue(
+        'search',
+        Exchange('search'),
+        routing_key='search'
+    ),
 )
 
 task_default_queue = 'normal'
 task_default_exchange = 'normal'
 task_default_routing_key = 'normal'
 task_default_exchange_type = 'direct'
-task_always_eager = True
+
+# Notification events are handed to the workers; run them inline only where
+# there is no broker (local development)
+task_always_eager = env.bool('CELERY_TASK_ALWAYS_EAGER', False)
@@ -0,0 +1,168 @@
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+from urllib import parse
+from django.db.models import Count, Q, Window
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class TimestampCursorPagination(BasePagination):
+    """
+    Keyset pagination over (created_at, id), newest first.
+
+    Pages are fetched with a range condition on the last row seen instead of
+    an OFFSET, so deep pages cost the same as the first one. The total count
+    is computed for the first page only and carried along in the cursor;
+    clients that do not need it can pass `count=false`.
+    """
+    cursor_query_param = 'cursor'
+    limit_query_param = 'limit'
+    count_query_param = 'count'
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_window(self, queryset, request):
+        """
+        Ordered queryset of the requested page and the rows after it
+        """
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+        self.reverse = self.cursor is not None and self.cursor['reverse']
+
+        if self.cursor is not None:
+            created_at = self.cursor['created_at']
+            pk = self.cursor['id']
+            if self.reverse:
+                queryset = queryset.filter(
+                    Q(created_at__gt=created_at) |
+                    Q(created_at=created_at, id__gt=pk)
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(created_at__lt=created_at) |
+                    Q(created_at=created_at, id__lt=pk)
+                )
+
+        return queryset.order_by(
+            *(('created_at', 'id') if self.reverse else ('-created_at', '-id'))
+        )
+
+    def carries_count(self, request):
+        return self.cursor is None and \
+            request.query_params.get(self.count_query_param) != 'false'
+
+    def get_page_version(self, queryset, request, fields):
+        """
+        Values of fields for the rows of the requested page, and the total
+        count when the page carries it, in a single query. The paginated
+        response is the same as long as these are.
+        """
+        window = self.get_window(queryset, request)
+        if self.carries_count(request):
+            window = window.annotate(total=Window(expression=Count('id')))
+            fields = list(fields) + ['total']
+
+        return list(window.values_list(*fields)[:self.page_size + 1])
+
+    def paginate_queryset(self, queryset, request, view=None):
+        window = self.get_window(queryset, request)
+
+        if self.cursor is not None:
+            self.count = self.cursor['count']
+        elif self.carries_count(request):
+            self.count = queryset.count()
+        else:
+            self.count = None
+
+        results = list(window[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if self.reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+
+        return self.page
+
+    def get_paginated_response(self, data):
+        response = OrderedDict()
+        if self.count is not None:
+            response['count'] = self.count
+        response['next'] = self.get_next_link()
+        response['previous'] = self.get_previous_link()
+        response['results'] = data
+
+        return Response(response)
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.limit_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+
+        if page_size <= 0:
+            return self.page_size
+
+        return min(page_size, self.max_page_size)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            querystring = b64decode(encoded.encode('ascii')).decode('ascii')
+            tokens = parse.parse_qs(querystring, keep_blank_values=True)
+            created_at = parse_datetime(tokens['t'][0])
+            pk = int(tokens['i'][0])
+            count = tokens.get('c', [''])[0]
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+
+        return {
+            'created_at': created_at,
+            'id': pk,
+            'reverse': 'r' in tokens,
+            'count': int(count) if count.isdigit() else None
+        }
+
+    def encode_cursor(self, instance, reverse):
+        tokens = OrderedDict([
+            ('t', instance.created_at.isoformat()),
+            ('i', str(instance.id)),
+        ])
+        if reverse:
+            tokens['r'] = '1'
+        if self.count is not None:
+            tokens['c'] = str(self.count)
+
+        querystring = parse.urlencode(tokens)
+        encoded = b64encode(querystring.encode('ascii')).decode('ascii')
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded
+        )
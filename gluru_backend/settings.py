@@ -100,6 +100,17 @@ else:
     }
 
 
+# Cache
+# https://docs.djangoproject.com/en/2.1/topics/cache/
+# Permission, info and product versions are bumped through the cache, so
+# every web and worker process must share it, e.g.
+# CACHE_URL=rediscache://127.0.0.1:6379/1. The local memory default only
+# suits a single process.
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
 
@@ -140,6 +151,18 @@ STATIC_URL = '/static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = str(root.path('media'))
 
+# Chunks of uploads in progress, outside of MEDIA_ROOT but on the same
+# filesystem: completed uploads are linked into it
+UPLOAD_SESSION_ROOT = env.str(
+    'UPLOAD_SESSION_ROOT', str(root.path('uploads'))
+)
+
+# 'nginx' or 'apache' to have the front-end server send attachment files,
+# with X-Accel-Redirect to SENDFILE_URL, an internal location aliasing
+# MEDIA_ROOT, or with X-Sendfile. Empty to stream them from Django.
+SENDFILE_BACKEND = env.str('SENDFILE_BACKEND', '')
+SENDFILE_URL = env.str('SENDFILE_URL', '/protected/')
+
 AUTH_USER_MODEL = 'profiles.User'
 
 AUTHENTICATION_BACKENDS = [
@@ -185,4 +208,10 @@ HAYSTACK_CONNECTIONS = {
     },
 }
 
+HAYSTACK_SIGNAL_PROCESSOR = 'tickets.signal_processors.QueuedSignalProcessor'
+
+# 'haystack' searches the haystack index above, 'postgres' the ticket
+# search vector maintained in the database
+TICKET_SEARCH_BACKEND = env.str('TICKET_SEARCH_BACKEND', 'haystack')
+
 HEX_KEY = env.str('HEX_KEY')
@@ -0,0 +1,31 @@
+from contextlib import contextmanager
+from django.db import connection
+from gluru_backend.celery import app
+
+
+@contextmanager
+def capture_on_commit_callbacks(execute=False):
+    """
+    Functions registered with transaction.on_commit in the block, which a
+    TestCase never commits; run in order at the end of the block with
+    execute. Callbacks of savepoints rolled back in the block are dropped
+    by Django and never captured. Same as Django 3.2's
+    TestCase.captureOnCommitCallbacks, except that tasks queued by the
+    callbacks run inline, there being no broker.
+    """
+    callbacks = []
+    start = len(connection.run_on_commit)
+    try:
+        yield callbacks
+    finally:
+        callbacks[:] = [
+            func for sids, func in connection.run_on_commit[start:]
+        ]
+        if execute:
+            always_eager = app.conf.task_always_eager
+            app.conf.task_always_eager = True
+            try:
+                for callback in callbacks:
+                    callback()
+            finally:
+                app.conf.task_always_eager = always_eager
@@ -1,15 +1,26 @@
 import hmac
+import json
+import base64
+import smtplib
 import binascii
 import hashlib
+import threading
+from calendar import timegm
+from contextlib import contextmanager
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db.models import Q
 from django.urls import reverse
 from django.conf import settings
 from django.contrib.sites.models import Site
-from django.core.mail import EmailMultiAlternatives
+from django.core.mail import EmailMultiAlternatives, get_connection
 from django.template import loader
-from django.utils.http import urlencode
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, urlencode
 from django.utils.six import text_type
-from info.models import UserRole
+from haystack.query import SQ
+from rest_framework import serializers
 
 
 def get_base_url():
@@ -30,27 +41,78 @@ def generate_ticket_link(ticket_slug, subscribe=None):
     return '{}{}'.format(get_base_url(), ticket_url)
 
 
-def send_mail(
+MAIL_RENDER_KEY = 'mail:render:{}'
+MAIL_RENDER_TIMEOUT = 60 * 60
+
+
+def render_mail(subject_template, email_template, context,
+                html_template=None):
+    """
+    Render subject, text and html bodies of an email.
+
+    Renders are cached by template set and context, so the same event
+    mailed to several groups or retried is only rendered once. Contexts
+    that are not plain JSON data are rendered every time.
+    """
+    try:
+        key = MAIL_RENDER_KEY.format(hashlib.sha256(json.dumps(
+            [subject_template, email_template, html_template, context],
+            sort_keys=True
+        ).encode('utf-8')).hexdigest())
+    except TypeError:
+        key = None
+
+    rendered = cache.get(key) if key is not None else None
+    if rendered is not None:
+        return rendered
+
+    subject = loader.render_to_string(subject_template, context)
+    rendered = {
+        'subject': ''.join(subject.splitlines()),
+        'body': loader.render_to_string(email_template, context),
+        'html': None
+    }
+
+    if html_template is not None:
+        rendered['html'] = loader.render_to_string(html_template, context)
+
+    if key is not None:
+        cache.set(key, rendered, MAIL_RENDER_TIMEOUT)
+
+    return rendered
+
+
+def build_mail(
         subject_template, email_template, context, to_email,
         html_template=None, from_email=settings.EMAIL_FROM, attachments=None):
 
-    subject = loader.render_to_string(subject_template, context)
-    subject = ''.join(subject.splitlines())
-    body = loader.render_to_string(email_template, context)
+    rendered = render_mail(
+        subject_template=subject_template,
+        email_template=email_template,
+        html_template=html_template,
+        context=context
+    )
 
     if not isinstance(to_email, list):
         to_email = [to_email]
 
+    # One message per event: several recipients are blind copied so they
+    # do not see each other's addresses
+    if len(to_email) > 1:
+        to_email, bcc = [], to_email
+    else:
+        bcc = None
+
     e_message = EmailMultiAlternatives(
-        subject,
-        body,
+        rendered['subject'],
+        rendered['body'],
         from_email,
-        to_email
+        to_email,
+        bcc=bcc
     )
 
-    if html_template is not None:
-        html_email = loader.render_to_string(html_template, context)
-        e_message.attach_alternative(html_email, 'text/html')
+    if rendered['html'] is not None:
+        e_message.attach_alternative(rendered['html'], 'text/html')
 
     if attachments:
         for attachment in attachments:
@@ -60,7 +122,148 @@ def send_mail(
                 attachment.get('type', 'application/pdf')
             )
 
-    e_message.send()
+    return e_message
+
+
+_mail = threading.local()
+
+
+def get_mail_connection():
+    """
+    Mail connection kept open for the life of the (worker) process
+    """
+    connection = getattr(_mail, 'connection', None)
+    if connection is None:
+        connection = get_connection()
+        connection.open()
+        _mail.connection = connection
+
+    return connection
+
+
+def close_mail_connection():
+    connection = getattr(_mail, 'connection', None)
+    _mail.connection = None
+    if connection is None:
+        return
+
+    try:
+        connection.close()
+    except (smtplib.SMTPException, OSError):
+        pass
+
+
+def send_messages(messages):
+    """
+    Send messages over the pooled connection, one at a time so that a bad
+    message does not fail the rest. A message that fails is tried once
+    more on a fresh connection, in case the pooled one went stale.
+
+    Returns a list of (message, exception) for the messages not sent.
+    """
+    failed = []
+    for message in messages:
+        for attempt in range(2):
+            try:
+                get_mail_connection().send_messages([message])
+                break
+            except (smtplib.SMTPException, OSError) as exc:
+                close_mail_connection()
+                if attempt:
+                    failed.append((message, exc))
+
+    return failed
+
+
+@contextmanager
+def mail_batch():
+    """
+    Collect the messages passed to send_mail instead of sending them, so
+    the caller can send them together with send_messages.
+    """
+    outbox = []
+    _mail.outbox = outbox
+    try:
+        yield outbox
+    finally:
+        _mail.outbox = None
+
+
+def serialize_mail(message):
+    """
+    JSON form of a message, for a task argument. Attachments are expected
+    as the (filename, content, mimetype) that build_mail adds, binary
+    content being base64 encoded.
+    """
+    alternatives = getattr(message, 'alternatives', [])
+    attachments = []
+    for filename, content, mimetype in message.attachments:
+        encoded = isinstance(content, bytes)
+        if encoded:
+            content = base64.b64encode(content).decode('ascii')
+        attachments.append([filename, content, mimetype, encoded])
+
+    return {
+        'subject': message.subject,
+        'body': message.body,
+        'from_email': message.from_email,
+        'to': message.to,
+        'cc': message.cc,
+        'bcc': message.bcc,
+        'reply_to': message.reply_to,
+        'headers': message.extra_headers,
+        'alternatives': [list(alternative) for alternative in alternatives],
+        'attachments': attachments
+    }
+
+
+def deserialize_mail(data):
+    # Messages serialized before cc, reply-to, headers and attachments
+    # were kept may still be waiting to be retried
+    attachments = []
+    for filename, content, mimetype, encoded in data.get('attachments', []):
+        if encoded:
+            content = base64.b64decode(content)
+        attachments.append((filename, content, mimetype))
+
+    return EmailMultiAlternatives(
+        data['subject'],
+        data['body'],
+        data['from_email'],
+        data['to'],
+        bcc=data['bcc'],
+        cc=data.get('cc'),
+        reply_to=data.get('reply_to'),
+        headers=data.get('headers'),
+        attachments=attachments,
+        alternatives=[tuple(alternative) for alternative in data[
+            'alternatives'
+        ]]
+    )
+
+
+def send_mail(
+        subject_template, email_template, context, to_email,
+        html_template=None, from_email=settings.EMAIL_FROM, attachments=None):
+
+    e_message = build_mail(
+        subject_template=subject_template,
+        email_template=email_template,
+        context=context,
+        to_email=to_email,
+        html_template=html_template,
+        from_email=from_email,
+        attachments=attachments
+    )
+
+    outbox = getattr(_mail, 'outbox', None)
+    if outbox is not None:
+        outbox.append(e_message)
+        return
+
+    failed = send_messages([e_message])
+    if failed:
+        raise failed[0][1]
 
 
 def generate_hash(string):
@@ -74,62 +277,237 @@ def generate_hash(string):
     ).hexdigest()
 
 
+def get_ticket_visibility(user):
+    """
+    Companies whose tickets user may list, besides the tickets without a
+    company; None when user may list every ticket
+    """
+    if user.is_superuser:
+        return None
+
+    principal = user.principal
+    if principal.has_staff_permission(
+        app_name='tickets',
+        model_name='Ticket',
+        action='list'
+    ):
+        return None
+
+    return principal.permitted_company_ids(
+        app_name='tickets',
+        model_name='Ticket',
+        action='list'
+    )
+
+
 def get_tickets_query(user):
     if user.is_authenticated:
-        if user.is_superuser:
+        company_ids = get_ticket_visibility(user)
+        if company_ids is None:
             return Q()
 
-        if user.is_staff:
-            staff_role = UserRole.objects.get(name='staff')
+        # A single IN predicate keeps the visibility index usable however
+        # many companies the user belongs to
+        if not company_ids:
+            return Q(company_association=None)
 
-            if staff_role.has_permission(
-                app_name='tickets',
-                model_name='Ticket',
-                action='list'
-            ):
-                return Q()
+        return Q(company_association=None) |\
+            Q(company_association__in=company_ids)
 
-        queries = Q(company_association=None)
-        companies = user.companies
-        for company in companies:
-            role = user.membership_set.filter(company=company).first().role
+    return Q(company_association=None, is_private=False)
 
-            if role.has_permission(
-                app_name='tickets',
-                model_name='Ticket',
-                action='list'
-            ):
-                queries |= Q(company_association=company)
 
-        return queries
+def get_tickets_search_query(user):
+    """
+    get_tickets_query for the search index; None when there is nothing
+    to filter
+    """
+    if user.is_authenticated:
+        company_ids = get_ticket_visibility(user)
+        if company_ids is None:
+            return None
 
-    return Q(company_association=None, is_private=False)
+        if not company_ids:
+            return SQ(company=0)
 
+        return SQ(company=0) | SQ(company__in=company_ids)
 
-def get_ticket_creatable_companies(user):
+    return SQ(company=0) & SQ(is_private=False)
+
+
+def get_tickets_permitted_query(user, action):
+    """
+    Tickets user may apply action to, as TicketCustomPermission decides
+    for a single ticket
+    """
     if user.is_superuser:
         return Q()
 
+    principal = user.principal
     if user.is_staff:
-        staff_role = UserRole.objects.get(name='staff')
-
-        if staff_role.has_permission(
+        if principal.has_staff_permission(
             app_name='tickets',
             model_name='Ticket',
-            action='create'
+            action=action
         ):
             return Q()
 
-    queries = Q(pk=0)
+        return Q(pk__in=[])
 
-    for company in user.companies:
-        role = user.membership_set.filter(company=company).first().role
-
-        if role.has_permission(
+    return Q(company_association=None, created_by=user) |\
+        Q(company_association__in=principal.permitted_company_ids(
             app_name='tickets',
             model_name='Ticket',
-            action='create'
-        ):
-            queries |= Q(pk=company.id)
+            action=action
+        ))
+
+
+def get_ticket_creatable_companies(user):
+    if user.is_superuser:
+        return Q()
+
+    principal = user.principal
+    if principal.has_staff_permission(
+        app_name='tickets',
+        model_name='Ticket',
+        action='create'
+    ):
+        return Q()
+
+    return Q(pk__in=principal.permitted_company_ids(
+        app_name='tickets',
+        model_name='Ticket',
+        action='create'
+    ))
+
+
+def get_eager_relations(model, serializer, prefix=''):
+    """
+    Paths of the relations rendered by serializer and the serializers
+    nested in it, as (select_related, prefetch_related) lists
+    """
+    opts = model._meta
+    reverse_relations = {
+        relation.get_accessor_name(): relation
+        for relation in opts.related_objects
+    }
+    select_related = []
+    prefetch_related = []
+
+    for field in serializer.fields.values():
+        if isinstance(field, serializers.ListSerializer):
+            nested = field.child
+        elif isinstance(field, serializers.ManyRelatedField):
+            nested = field.child_relation
+        else:
+            nested = field
+
+        if not isinstance(nested, (
+                serializers.BaseSerializer, serializers.RelatedField)):
+            continue
+
+        if field.source == '*' or '.' in field.source:
+            continue
+
+        try:
+            model_field = opts.get_field(field.source)
+        except FieldDoesNotExist:
+            model_field = reverse_relations.get(field.source)
+
+        if model_field is None or not model_field.is_relation:
+            continue
+
+        path = prefix + field.source
+        many = model_field.many_to_many or model_field.one_to_many
+        if many:
+            prefetch_related.append(path)
+        elif isinstance(nested, serializers.BaseSerializer):
+            select_related.append(path)
+
+        if isinstance(nested, serializers.BaseSerializer):
+            nested_select, nested_prefetch = get_eager_relations(
+                model_field.related_model, nested, path + '__'
+            )
+            # Relations of prefetched objects are prefetched along
+            (prefetch_related if many else select_related).extend(
+                nested_select
+            )
+            prefetch_related.extend(nested_prefetch)
+
+    return select_related, prefetch_related
+
+
+def eager_load(queryset, serializer_class):
+    """
+    Select or prefetch every relation that serializer_class renders, at
+    any depth, so that serializing a page of the queryset takes a fixed
+    number of queries
+    """
+    select_related, prefetch_related = get_eager_relations(
+        queryset.model, serializer_class()
+    )
+
+    return queryset.select_related(
+        *select_related
+    ).prefetch_related(
+        *prefetch_related
+    )
+
+
+def get_user_version(user):
+    """
+    What representations may depend on of the requesting user: who they
+    are and, through permissions, their roles
+    """
+    if not user.is_authenticated:
+        return None
+
+    return [
+        user.pk, user.is_superuser, user.is_staff,
+        sorted(user.principal.roles.items())
+    ]
+
+
+def get_etag(*parts):
+    """
+    Strong entity tag of a representation that stays the same as long as
+    parts do
+    """
+    return '"{}"'.format(hashlib.sha1(json.dumps(
+        parts, cls=DjangoJSONEncoder
+    ).encode('utf-8')).hexdigest())
+
+
+def set_validators(response, etag, last_modified=None, per_user=True):
+    """
+    Validators of a response; per_user=False for representations that
+    are the same for every user
+    """
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(
+            timegm(last_modified.utctimetuple())
+        )
+
+    # Representations differ between users
+    if per_user:
+        patch_vary_headers(response, ['Authorization'])
+    return response
+
+
+def get_not_modified(request, etag, last_modified=None, per_user=True):
+    """
+    304 response when the client's copy, as told by If-None-Match or
+    If-Modified-Since, is still current, 412 when an If-Match or
+    If-Unmodified-Since precondition fails; None otherwise
+    """
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=timegm(last_modified.utctimetuple())
+        if last_modified is not None else None
+    )
+    if response is None:
+        return None
 
-    return queries
+    return set_validators(response, etag, last_modified, per_user)
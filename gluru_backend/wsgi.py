@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gluru_backend.settings')
 
 application = get_wsgi_application()
+
+# Ready before the first autocomplete request instead of built by it
+from tickets.autocomplete import title_index  # noqa: E402
+
+title_index.build()
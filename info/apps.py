@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class InfoConfig(AppConfig):
     name = 'info'
+
+    def ready(self):
+        import info.checks      # noqa
+        import info.signals     # noqa
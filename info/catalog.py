@@ -0,0 +1,51 @@
+from collections import namedtuple
+from info import constants
+from info.models import GluuProduct, get_data_version
+
+CatalogProduct = namedtuple(
+    'CatalogProduct', ['instance', 'versions', 'os']
+)
+
+# Process-local catalog, tagged with the shared version
+_catalog = {
+    'version': None,
+    'by_id': {},
+    'by_name': {}
+}
+
+
+def get_product_catalog():
+    """
+    Products by id and by lowercased name, with their versions and OS
+    values as sets. Loaded again only after a product changed.
+    """
+    version = get_data_version(constants.PRODUCT_CATALOG_VERSION_KEY)
+    if version != _catalog['version']:
+        by_id = {}
+        for product in GluuProduct.objects.all():
+            by_id[product.pk] = CatalogProduct(
+                instance=product,
+                versions=frozenset(product.version),
+                os=frozenset(product.os)
+            )
+
+        _catalog['by_id'] = by_id
+        _catalog['by_name'] = {
+            product.instance.name.lower(): product
+            for product in by_id.values()
+        }
+        _catalog['version'] = version
+
+    return _catalog
+
+
+def get_product(pk=None, name=None):
+    """
+    CatalogProduct of the product with pk or, names being case-insensitive,
+    name; None when there is none
+    """
+    catalog = get_product_catalog()
+    if name is not None:
+        return catalog['by_name'].get(name.lower())
+
+    return catalog['by_id'].get(pk)
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+
+@register(deploy=True)
+def shared_cache_check(app_configs, **kwargs):
+    """
+    Cached versions only invalidate across processes through a shared cache
+    """
+    backend = settings.CACHES['default']['BACKEND']
+    if not backend.endswith('LocMemCache'):
+        return []
+
+    return [
+        Warning(
+            'The default cache is local to each process, so permission, '
+            'info and product changes do not reach the other processes.',
+            hint='Set CACHE_URL to a Redis or memcached server.',
+            id='info.W001'
+        )
+    ]
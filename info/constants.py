@@ -5,3 +5,14 @@ PRIORITY = (
     (HIGH_PRIORITY, 'High'),
     (LOW_PRIORITY, 'Low')
 )
+
+STAFF_ROLE = 'staff'
+
+PERMISSION_MATRIX_VERSION_KEY = 'info:permission-matrix:version'
+PERMISSION_MATRIX_KEY = 'info:permission-matrix:{}'
+
+INFO_BUNDLE_VERSION_KEY = 'info:bundle:version'
+INFO_BUNDLE_KEY = 'info:bundle:{}'
+INFO_BUNDLE_TIMEOUT = 60 * 60 * 24
+
+PRODUCT_CATALOG_VERSION_KEY = 'info:product-catalog:version'
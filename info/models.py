@@ -1,4 +1,6 @@
+from uuid import uuid4
 from django.db import models
+from django.core.cache import cache
 from django.contrib.postgres.fields import CICharField, ArrayField
 from info import constants
 
@@ -114,16 +116,7 @@ class UserRole(models.Model):
         return self.name
 
     def has_permission(self, app_name, model_name, action):
-        permissions = self.permissions.filter(
-            app_name=app_name,
-            model_name=model_name
-        )
-
-        for permission in permissions:
-            if action in permission.actions:
-                return True
-
-        return False
+        return role_has_permission(self.pk, app_name, model_name, action)
 
 
 class Permission(models.Model):
@@ -144,3 +137,85 @@ class Permission(models.Model):
 
     def __str__(self):
         return self.description
+
+
+# Process-local copy of the compiled matrix, tagged with the shared version
+_permission_matrix = {
+    'version': None,
+    'matrix': None
+}
+
+
+def build_permission_matrix():
+    """
+    Compile every role's permissions into a (role, app, model) -> actions map
+    """
+    roles = {}
+    actions = {}
+
+    for role_id, name in UserRole.objects.values_list('id', 'name'):
+        roles[name.lower()] = role_id
+
+    grants = UserRole.permissions.through.objects.values_list(
+        'userrole_id', 'permission__app_name', 'permission__model_name',
+        'permission__actions'
+    )
+    for role_id, app_name, model_name, permission_actions in grants:
+        key = (role_id, app_name, model_name)
+        actions.setdefault(key, set()).update(permission_actions)
+
+    return {
+        'roles': roles,
+        'actions': {key: frozenset(value) for key, value in actions.items()}
+    }
+
+
+def get_permission_matrix():
+    version = cache.get(constants.PERMISSION_MATRIX_VERSION_KEY)
+    if version is not None and version == _permission_matrix['version']:
+        return _permission_matrix['matrix']
+
+    if version is None:
+        cache.add(constants.PERMISSION_MATRIX_VERSION_KEY, uuid4().hex, None)
+        version = cache.get(constants.PERMISSION_MATRIX_VERSION_KEY)
+
+    matrix_key = constants.PERMISSION_MATRIX_KEY.format(version)
+    matrix = cache.get(matrix_key)
+    if matrix is None:
+        matrix = build_permission_matrix()
+        cache.set(matrix_key, matrix, None)
+
+    _permission_matrix['version'] = version
+    _permission_matrix['matrix'] = matrix
+    return matrix
+
+
+def invalidate_permission_matrix():
+    cache.set(constants.PERMISSION_MATRIX_VERSION_KEY, uuid4().hex, None)
+
+
+def get_data_version(key):
+    """
+    Version of some shared data, kept in the cache at key and changed by
+    bump_data_version whenever the data is
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid4().hex, None)
+        version = cache.get(key)
+
+    return version
+
+
+def bump_data_version(key):
+    cache.set(key, uuid4().hex, None)
+
+
+def role_has_permission(role_id, app_name, model_name, action):
+    if role_id is None:
+        return False
+
+    actions = get_permission_matrix()['actions'].get(
+        (role_id, app_name, model_name), ()
+    )
+    return action in actions
@@ -0,0 +1,49 @@
+from functools import partial
+from django.db import transaction
+from django.dispatch import receiver
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from info import constants
+from info.models import (
+    GluuProduct, TicketCategory, TicketIssueType, TicketStatus, UserRole,
+    Permission, invalidate_permission_matrix, bump_data_version
+)
+
+
+@receiver(post_save, sender=UserRole)
+@receiver(post_delete, sender=UserRole)
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+@receiver(m2m_changed, sender=UserRole.permissions.through)
+def permissions_changed(sender, **kwargs):
+    # Invalidate right away for this process and again once the change is
+    # visible to others, so no worker compiles a matrix from stale rows
+    invalidate_permission_matrix()
+    transaction.on_commit(invalidate_permission_matrix)
+
+
+@receiver(post_save, sender=GluuProduct)
+@receiver(post_delete, sender=GluuProduct)
+@receiver(post_save, sender=TicketCategory)
+@receiver(post_delete, sender=TicketCategory)
+@receiver(post_save, sender=TicketIssueType)
+@receiver(post_delete, sender=TicketIssueType)
+@receiver(post_save, sender=TicketStatus)
+@receiver(post_delete, sender=TicketStatus)
+@receiver(post_save, sender=UserRole)
+@receiver(post_delete, sender=UserRole)
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+@receiver(m2m_changed, sender=UserRole.permissions.through)
+def info_changed(sender, **kwargs):
+    # Same as permissions_changed, for GetAllInfoView's bundle
+    bump = partial(bump_data_version, constants.INFO_BUNDLE_VERSION_KEY)
+    bump()
+    transaction.on_commit(bump)
+
+
+@receiver(post_save, sender=GluuProduct)
+@receiver(post_delete, sender=GluuProduct)
+def products_changed(sender, **kwargs):
+    bump = partial(bump_data_version, constants.PRODUCT_CATALOG_VERSION_KEY)
+    bump()
+    transaction.on_commit(bump)
@@ -1,13 +1,21 @@
 import json
+from django.core.cache import cache
+from django.db import connection
 from django.urls import reverse
 from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework.test import APITestCase
 from djangorestframework_camel_case.util import camelize
 from profiles.models import User
+from tickets.models import Ticket
+from info.catalog import get_product
+from info.checks import shared_cache_check
+from info.constants import INFO_BUNDLE_KEY, INFO_BUNDLE_VERSION_KEY
 from info.models import (
     GluuProduct, TicketCategory, TicketIssueType, TicketStatus,
-    UserRole, Permission
+    UserRole, Permission, get_data_version
 )
 from info.serializers import (
     GluuProductSerializer, TicketCategorySerializer, TicketIssueTypeSerializer,
@@ -252,6 +260,107 @@ class TicketCategoryViewSetTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['results'], camelize(serializer.data))
 
+    def test_list_tickets(self):
+        """
+         - list category tickets by visitor
+         - list category tickets by ticket creator
+        """
+        for is_private, is_deleted in [
+                (False, False), (True, False), (False, True)]:
+            Ticket.objects.create(
+                title='title', body='body', category=self.category,
+                status_id=1, issue_type_id=1, gluu_server='3.1.4',
+                os='Ubuntu', created_by=self.user, is_private=is_private,
+                is_deleted=is_deleted
+            )
+
+        url = reverse('info:category-tickets', kwargs={'pk': self.category.id})
+
+        # list category tickets by visitor
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+
+        # list category tickets by ticket creator
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.user.token)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+
+    def test_paginate_tickets(self):
+        """
+         - walk category tickets forwards
+         - walk category tickets backwards
+         - list category tickets without count
+        """
+        tickets = [
+            Ticket.objects.create(
+                title='title', body='body', category=self.category,
+                status_id=1, issue_type_id=1, gluu_server='3.1.4',
+                os='Ubuntu', created_by=self.user
+            ) for _ in range(5)
+        ]
+        expected = [ticket.id for ticket in reversed(tickets)]
+
+        # walk category tickets forwards
+        url = '{}?limit=2'.format(
+            reverse('info:category-tickets', kwargs={'pk': self.category.id})
+        )
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data['count'], 5)
+            pages.append([ticket['id'] for ticket in response.data['results']])
+            url = response.data['next']
+        self.assertEqual(pages, [expected[:2], expected[2:4], expected[4:]])
+
+        # walk category tickets backwards
+        url = response.data['previous']
+        response = self.client.get(url)
+        self.assertEqual(
+            [ticket['id'] for ticket in response.data['results']],
+            expected[2:4]
+        )
+        response = self.client.get(response.data['previous'])
+        self.assertEqual(
+            [ticket['id'] for ticket in response.data['results']],
+            expected[:2]
+        )
+        self.assertEqual(response.data['previous'], None)
+
+        # list category tickets without count
+        response = self.client.get(
+            reverse('info:category-tickets', kwargs={'pk': self.category.id}),
+            {'count': 'false'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', response.data)
+
+    def test_list_tickets_queries(self):
+        """
+         - list category tickets with voters and subscribers
+        """
+        url = reverse('info:category-tickets', kwargs={'pk': self.category.id})
+        query_counts = []
+
+        for ticket_count in [1, 5]:
+            for _ in range(ticket_count):
+                ticket = Ticket.objects.create(
+                    title='title', body='body', category=self.category,
+                    status_id=1, issue_type_id=1, gluu_server='3.1.4',
+                    os='Ubuntu', created_by=self.user
+                )
+                ticket.voters.add(self.user, self.manager)
+                ticket.subscribers.add(self.user)
+
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            query_counts.append(len(queries))
+
+        self.assertEqual(query_counts[0], query_counts[1])
+
     def test_update_info(self):
         """
          - update info by user
@@ -832,6 +941,38 @@ class UserRoleViewSetTest(APITestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
+    def test_permission_matrix(self):
+        """
+         - compiled permissions are answered without queries
+         - updating role permissions invalidates compiled permissions
+        """
+        # compiled permissions are answered without queries
+        self.assertTrue(self.role.has_permission('tickets', 'Ticket', 'list'))
+        with self.assertNumQueries(0):
+            self.assertTrue(
+                self.role.has_permission('tickets', 'Ticket', 'assign')
+            )
+            self.assertFalse(
+                self.role.has_permission('tickets', 'Ticket', 'vote')
+            )
+
+        # updating role permissions invalidates compiled permissions
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Token ' + self.manager.token
+        )
+        response = self.client.put(
+            reverse('info:role-detail', kwargs={'pk': self.role.id}),
+            data=json.dumps(self.valid_payload),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(
+            self.role.has_permission('tickets', 'Ticket', 'list')
+        )
+        self.assertTrue(
+            self.role.has_permission('billing', 'Billing', 'update')
+        )
+
 
 class PermissionViewSetTest(APITestCase):
 
@@ -1021,3 +1162,136 @@ class PermissionViewSetTest(APITestCase):
             reverse('info:permission-detail', kwargs={'pk': 0}),
         )
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class GetAllInfoViewTest(APITestCase):
+
+    def setUp(self):
+        call_command('loaddata', 'data', verbosity=0)
+
+        self.manager = User.objects.create_superuser(
+            email='manager@gmail.com',
+            password='manager'
+        )
+
+    def test_get_all_info(self):
+        """
+         - get all info
+         - get the same info whoever asks
+         - get all info again without queries
+         - revalidate unchanged info
+         - revalidate info after a change by manager
+         - drop the bundle of the previous version
+        """
+        # get all info
+        version = get_data_version(INFO_BUNDLE_VERSION_KEY)
+        response = self.client.get('/api/info/all/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data['user_roles'],
+            UserRoleSerializer(UserRole.objects.all(), many=True).data
+        )
+        etag = response['ETag']
+
+        # get the same info whoever asks
+        self.assertNotIn('Authorization', response.get('Vary', ''))
+
+        # get all info again without queries
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/info/all/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 0)
+
+        # revalidate unchanged info
+        response = self.client.get('/api/info/all/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertNotIn('Authorization', response.get('Vary', ''))
+
+        # revalidate info after a change by manager
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Token ' + self.manager.token
+        )
+        response = self.client.post(
+            reverse('info:status-list'),
+            data=json.dumps(
+                {'ticket_status': {'name': 'Closed', 'slug': 'closed'}}
+            ),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.client.credentials()
+        response = self.client.get('/api/info/all/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(
+            'closed',
+            [ticket_status['slug'] for ticket_status in response.data[
+                'statuses'
+            ]]
+        )
+
+        # drop the bundle of the previous version
+        self.assertIsNone(cache.get(INFO_BUNDLE_KEY.format(version)))
+        self.assertIsNotNone(cache.get(INFO_BUNDLE_KEY.format(
+            get_data_version(INFO_BUNDLE_VERSION_KEY)
+        )))
+
+
+class ProductCatalogTest(APITestCase):
+
+    def setUp(self):
+        call_command('loaddata', 'data', verbosity=0)
+
+        self.manager = User.objects.create_superuser(
+            email='manager@gmail.com',
+            password='manager'
+        )
+        self.product = GluuProduct.objects.get(name='Gluu Server')
+
+    def test_product_catalog(self):
+        """
+         - look up product
+         - look up product again without queries
+         - look up product after adding a version by manager
+        """
+        # look up product
+        product = get_product(name='gluu server')
+        self.assertEqual(product.instance, self.product)
+        self.assertEqual(product.versions, set(self.product.version))
+
+        # look up product again without queries
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(get_product(pk=self.product.id), product)
+        self.assertEqual(len(queries), 0)
+
+        # look up product after adding a version by manager
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Token ' + self.manager.token
+        )
+        response = self.client.put(
+            reverse('info:product-add-info', args=[self.product.id]),
+            data=json.dumps({'product': {'version': '9.9.9'}}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('9.9.9', get_product(pk=self.product.id).versions)
+
+
+class SharedCacheCheckTest(SimpleTestCase):
+
+    def test_shared_cache_check(self):
+        """
+         - warn about a process-local cache
+         - accept a shared cache
+        """
+        # warn about a process-local cache
+        self.assertEqual(
+            [error.id for error in shared_cache_check(None)],
+            ['info.W001']
+        )
+
+        # accept a shared cache
+        with override_settings(CACHES={'default': {
+                'BACKEND': 'django_redis.cache.RedisCache',
+                'LOCATION': 'redis://127.0.0.1:6379/1'}}):
+            self.assertEqual(shared_cache_check(None), [])
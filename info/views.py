@@ -3,55 +3,97 @@ from rest_framework.views import APIView
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.exceptions import ValidationError
+from django.core.cache import cache
 from tickets.serializers import TicketSerializer
+from gluru_backend.utils import (
+    get_tickets_query, eager_load, get_etag, get_not_modified,
+    set_validators
+)
+from gluru_backend.pagination import TimestampCursorPagination
 from info import models as m
 from info import serializers as s
 from info import permissions as p
+from info import constants
 
 
-class GetAllInfoView(APIView):
-    def get(self, reqeust):
-        products = m.GluuProduct.objects.all()
-        issue_types = m.TicketIssueType.objects.all()
-        categories = m.TicketCategory.objects.all()
-        statuses = m.TicketStatus.objects.all()
-        permissions = m.Permission.objects.all()
-        user_roles = m.UserRole.objects.all()
-
-        product_serializer = s.GluuProductSerializer(
-            products,
+# Process-local copy of the serialized bundle, tagged with the shared version
+_info_bundle = {
+    'version': None,
+    'data': None
+}
+
+
+def build_info_bundle():
+    return {
+        'products': s.GluuProductSerializer(
+            m.GluuProduct.objects.all(),
             many=True
-        )
-        type_serializer = s.TicketIssueTypeSerializer(
-            issue_types,
+        ).data,
+        'types': s.TicketIssueTypeSerializer(
+            m.TicketIssueType.objects.all(),
             many=True
-        )
-        category_serializer = s.TicketCategorySerializer(
-            categories,
+        ).data,
+        'categories': s.TicketCategorySerializer(
+            m.TicketCategory.objects.all(),
             many=True
-        )
-        status_serializer = s.TicketStatusSerializer(
-            statuses,
+        ).data,
+        'statuses': s.TicketStatusSerializer(
+            m.TicketStatus.objects.all(),
             many=True
-        )
-        permission_serializer = s.PermissionSerializer(
-            permissions,
+        ).data,
+        'permissions': s.PermissionSerializer(
+            m.Permission.objects.all(),
             many=True
-        )
-        user_role_serializer = s.UserRoleSerializer(
-            user_roles,
+        ).data,
+        'user_roles': s.UserRoleSerializer(
+            m.UserRole.objects.prefetch_related('permissions'),
             many=True
-        )
+        ).data
+    }
+
+
+def get_info_bundle():
+    """
+    Serialized reference data and its version, rebuilt only after a
+    change to any of it. Bundles of older versions are deleted when known,
+    and otherwise expire after INFO_BUNDLE_TIMEOUT seconds.
+    """
+    version = m.get_data_version(constants.INFO_BUNDLE_VERSION_KEY)
+    if version == _info_bundle['version']:
+        return version, _info_bundle['data']
+
+    bundle_key = constants.INFO_BUNDLE_KEY.format(version)
+    data = cache.get(bundle_key)
+    if data is None:
+        data = build_info_bundle()
+        cache.set(bundle_key, data, constants.INFO_BUNDLE_TIMEOUT)
+
+        if _info_bundle['version'] is not None:
+            cache.delete(
+                constants.INFO_BUNDLE_KEY.format(_info_bundle['version'])
+            )
 
-        return Response({
-                'products': product_serializer.data,
-                'types': type_serializer.data,
-                'categories': category_serializer.data,
-                'statuses': status_serializer.data,
-                'permissions': permission_serializer.data,
-                'user_roles': user_role_serializer.data
-            },
-            status=status.HTTP_200_OK
+    _info_bundle['version'] = version
+    _info_bundle['data'] = data
+    return version, data
+
+
+class GetAllInfoView(APIView):
+    # The bundle is the same for everyone, so no need to load the user
+    authentication_classes = ()
+
+    def get(self, request):
+        version, data = get_info_bundle()
+        etag = get_etag(version)
+
+        not_modified = get_not_modified(request, etag, per_user=False)
+        if not_modified is not None:
+            return not_modified
+
+        return set_validators(
+            Response(data, status=status.HTTP_200_OK),
+            etag,
+            per_user=False
         )
 
 
@@ -161,6 +203,7 @@ class TicketCategoryViewSet(mixins.CreateModelMixin,
                             viewsets.GenericViewSet):
     serializer_class = s.TicketCategorySerializer
     permission_classes = (p.IsSuperUserOrReadOnly, )
+    pagination_class = TimestampCursorPagination
 
     def get_queryset(self):
         return m.TicketCategory.objects.all()
@@ -195,7 +238,14 @@ class TicketCategoryViewSet(mixins.CreateModelMixin,
     @action(detail=True, methods=['GET'])
     def tickets(self, request, pk=None):
         category = self.get_object()
-        page = self.paginate_queryset(category.tickets.all())
+        queryset = category.tickets.filter(
+            is_deleted=False
+        ).filter(
+            get_tickets_query(request.user)
+        )
+        page = self.paginate_queryset(
+            eager_load(queryset, TicketSerializer)
+        )
 
         serializer = TicketSerializer(
             page,
@@ -245,6 +295,7 @@ class TicketIssueTypeViewSet(mixins.CreateModelMixin,
                              viewsets.GenericViewSet):
     serializer_class = s.TicketIssueTypeSerializer
     permission_classes = (p.IsSuperUserOrReadOnly, )
+    pagination_class = TimestampCursorPagination
 
     def get_queryset(self):
         return m.TicketIssueType.objects.all()
@@ -279,7 +330,14 @@ class TicketIssueTypeViewSet(mixins.CreateModelMixin,
     @action(detail=True, methods=['GET'])
     def tickets(self, request, pk=None):
         issue_type = self.get_object()
-        page = self.paginate_queryset(issue_type.tickets.all())
+        queryset = issue_type.tickets.filter(
+            is_deleted=False
+        ).filter(
+            get_tickets_query(request.user)
+        )
+        page = self.paginate_queryset(
+            eager_load(queryset, TicketSerializer)
+        )
 
         serializer = TicketSerializer(
             page,
@@ -0,0 +1,29 @@
+TICKET_CREATED = 'ticket_created'
+TICKET_ASSIGNED = 'ticket_assigned'
+TICKET_REOPENED = 'ticket_reopened'
+ANSWER_CREATED = 'answer_created'
+INVITATION_CREATED = 'invitation_created'
+
+MARKDOWN_TEXT_KEY = 'notification:markdown-text:{}'
+MARKDOWN_TEXT_TIMEOUT = 60 * 60 * 24
+
+EMAIL_REMINDER = 'email'
+SMS_REMINDER = 'sms'
+
+REMINDER_KIND = (
+    (EMAIL_REMINDER, 'Email'),
+    (SMS_REMINDER, 'SMS')
+)
+
+DEFAULT_SUPPORT_PLAN = 'basic'
+DEFAULT_RESPONSE_TIME = 30
+SLA_SCAN_CHUNK_SIZE = 100
+
+# ResponseTime.issue_type keys and the slugs of the matching issue types
+SLA_ISSUE_TYPES = {
+    'outage': 'production-outage',
+    'impaired': 'production-impaired',
+    'pre_production': 'pre-preoduction-issue',
+    'minor': 'minor-issue',
+    'new_development': 'new-development-issue',
+}
@@ -0,0 +1,22 @@
+from django.db import transaction
+from notification.tasks import process_notification_event
+
+
+def record_event(event_type, actor=None, **object_ids):
+    """
+    Queue a notification event once the current transaction commits.
+
+    Only the event type and primary keys travel with the event; recipients
+    are resolved and emails rendered by the worker.
+    """
+    event = dict(object_ids)
+    event['type'] = event_type
+    event['actor_id'] = actor.pk if actor is not None else None
+
+    transaction.on_commit(
+        lambda: process_notification_event.apply_async(
+            args=[event],
+            queue='low',
+            routing_key='low'
+        )
+    )
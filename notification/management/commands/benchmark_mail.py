@@ -0,0 +1,81 @@
+import asyncore
+import smtpd
+import threading
+import time
+
+from django.core.mail import EmailMultiAlternatives
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from gluru_backend.utils import close_mail_connection, send_messages
+
+SMTP_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+
+
+class Sink(smtpd.SMTPServer):
+    """
+    SMTP server accepting and dropping every message
+    """
+
+    def process_message(self, *args, **kwargs):
+        return None
+
+
+class Command(BaseCommand):
+    """
+    Compare the throughput of sending each message on its own connection
+    with send_messages over the pooled one, against a local SMTP sink.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--messages',
+            type=int,
+            default=300,
+            help='Number of messages to send each way'
+        )
+        parser.add_argument(
+            '--port',
+            type=int,
+            default=8025,
+            help='Port of the SMTP sink'
+        )
+
+    def handle(self, *args, **options):
+        count = options['messages']
+        sink = Sink(('127.0.0.1', options['port']), None)
+        threading.Thread(target=asyncore.loop, daemon=True).start()
+
+        messages = [
+            EmailMultiAlternatives(
+                'Ticket updated', 'body ' * 400, 'support@gluu.org',
+                ['user{}@gluu.org'.format(number)]
+            )
+            for number in range(count)
+        ]
+
+        try:
+            with override_settings(
+                    EMAIL_BACKEND=SMTP_BACKEND,
+                    EMAIL_HOST='127.0.0.1',
+                    EMAIL_PORT=options['port'],
+                    EMAIL_USE_TLS=False,
+                    EMAIL_HOST_USER='',
+                    EMAIL_HOST_PASSWORD=''):
+                started = time.time()
+                for message in messages:
+                    message.send()
+                separate = time.time() - started
+
+                close_mail_connection()
+                started = time.time()
+                failed = send_messages(messages)
+                pooled = time.time() - started
+                close_mail_connection()
+        finally:
+            sink.close()
+
+        self.stdout.write(
+            'connection per message: {:.0f} msg/s, pooled: {:.0f} msg/s, '
+            '{} failed'.format(count / separate, count / pooled, len(failed))
+        )
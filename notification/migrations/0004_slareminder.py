@@ -0,0 +1,32 @@
+# Generated by Django 2.1.4 on 2026-10-18 11:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0003_ticket_counters'),
+        ('notification', '0003_auto_20190108_1421'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SLAReminder',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('email', 'Email'), ('sms', 'SMS')], max_length=10)),
+                ('sent_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ticket', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sla_reminders', to='tickets.Ticket')),
+            ],
+            options={
+                'ordering': ['-sent_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='slareminder',
+            index=models.Index(fields=['ticket', 'kind', 'sent_at'], name='sla_reminder_idx'),
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.db import models
+from django.utils import timezone
 from phonenumber_field.modelfields import PhoneNumberField
+from notification import constants
 from gluru_backend.models import TimestampedModel
 from django.contrib.postgres.fields import ArrayField
 from django.conf import settings
@@ -90,3 +92,35 @@ class NotificationSetting(models.Model):
 
     def __str__(self):
         return 'Notification setting of {}'.format(self.user)
+
+
+class SLAReminder(models.Model):
+
+    ticket = models.ForeignKey(
+        'tickets.Ticket',
+        on_delete=models.CASCADE,
+        related_name='sla_reminders'
+    )
+
+    kind = models.CharField(
+        max_length=10,
+        choices=constants.REMINDER_KIND
+    )
+
+    sent_at = models.DateTimeField(
+        default=timezone.now
+    )
+
+    def __str__(self):
+        return '{} reminder for ticket {} at {}'.format(
+            self.kind, self.ticket_id, self.sent_at
+        )
+
+    class Meta:
+        ordering = ['-sent_at']
+        indexes = [
+            models.Index(
+                fields=['ticket', 'kind', 'sent_at'],
+                name='sla_reminder_idx'
+            ),
+        ]
@@ -1,15 +1,47 @@
+import re
+import hashlib
 import markdown
 from bs4 import BeautifulSoup
 from django.contrib.sites.models import Site
 from django.conf import settings
-from notification.tasks import send_notification_by_email
-from gluru_backend.utils import generate_ticket_link
+from django.core.cache import cache
+from django.db.models import Q
+from notification import constants
+from gluru_backend.utils import generate_ticket_link, send_mail
+from profiles.models import User, Invitation
+from tickets.models import Ticket, Answer
+
+
+def send_notification(subject_template, email_template, html_template,
+                      context, to_email):
+    if isinstance(to_email, list):
+        to_email = sorted(set(to_email))
+
+    if not to_email:
+        return
+
+    send_mail(
+        subject_template=subject_template,
+        email_template=email_template,
+        html_template=html_template,
+        context=context,
+        to_email=to_email
+    )
 
 
-def gather_ticket_email_context(ticket):
-    site = Site.objects.get_current()
+def markdown_to_text(body):
+    """
+    Plain text of a markdown body, cached per body revision
+    """
+    key = constants.MARKDOWN_TEXT_KEY.format(
+        hashlib.sha256(body.encode('utf-8')).hexdigest()
+    )
+    text = cache.get(key)
+    if text is not None:
+        return text
+
     html = markdown.markdown(
-        ticket.body,
+        body,
         safe_mode='escape',
         extensions=['markdown.extensions.fenced_code']
     )
@@ -17,6 +49,22 @@ def gather_ticket_email_context(ticket):
     text = ''.join(
         BeautifulSoup(html, features="html.parser").findAll(text=True)
     )
+    cache.set(key, text, constants.MARKDOWN_TEXT_TIMEOUT)
+
+    return text
+
+
+def as_text(value):
+    """
+    Text of a model instance for an email context, empty for none rather
+    than 'None'
+    """
+    return '' if value is None else str(value)
+
+
+def gather_ticket_email_context(ticket):
+    site = Site.objects.get_current()
+    text = markdown_to_text(ticket.body)
 
     context = {
         'ticket_id': ticket.id,
@@ -27,7 +75,7 @@ def gather_ticket_email_context(ticket):
         'ticket_created_by_comp': 'Company',
         'ticket_body_txt': text,
         'subscription_link': generate_ticket_link(ticket.slug),
-        'issue_type': ticket.issue_type
+        'issue_type': as_text(ticket.issue_type)
     }
 
     return context
@@ -40,125 +88,91 @@ def notify_new_ticket(ticket):
     context = gather_ticket_email_context(ticket)
 
     # Gluu support team will be notified as well
-    send_notification_by_email.apply_async(
-        args=[{
-            'subject_template': 'new_ticket/support_for_sub.txt',
-            'email_template': 'new_ticket/support_for_user.txt',
-            'html_template': 'new_ticket/support_for_user.html',
-            'context': context,
-            'to_email': settings.NOTIFICATIONS_RECIPIENT
-        }],
-        queue='low',
-        routing_key='low'
+    send_notification(
+        subject_template='new_ticket/support_for_sub.txt',
+        email_template='new_ticket/support_for_user.txt',
+        html_template='new_ticket/support_for_user.html',
+        context=context,
+        to_email=settings.NOTIFICATIONS_RECIPIENT
     )
 
-    if ticket.company_association:
+    if ticket.company_association_id:
         # The ticket owner will be notified of new ticket addition
-        send_notification_by_email.apply_async(
-            args=[{
-                'subject_template': 'new_ticket/sub.txt',
-                'email_template': 'new_ticket/ticket_owner.txt',
-                'html_template': 'new_ticket/ticket_owner.html',
-                'context': context,
-                'to_email': ticket.created_for.email
-            }],
-            queue='low',
-            routing_key='low'
+        send_notification(
+            subject_template='new_ticket/sub.txt',
+            email_template='new_ticket/ticket_owner.txt',
+            html_template='new_ticket/ticket_owner.html',
+            context=context,
+            to_email=ticket.owned_by.email
         )
 
         # Colleagues who subscribed to "Company notifications" will be notified
-        company_users = ticket.company_association.users.all()
-        recipients = []
-
-        for user in company_users:
-            if ticket.category.id in user.notification_setting.category:
-                recipients.append(user.email)
-                continue
-
-            if ticket.issue_type.id in user.notification_setting.issue_type:
-                recipients.append(user.email)
-                continue
-
-        send_notification_by_email.apply_async(
-            args=[{
-                'subject_template': 'new_ticket/sub.txt',
-                'email_template': 'new_ticket/for_staff.txt',
-                'html_template': 'new_ticket/for_staff.html',
-                'context': context,
-                'to_email': recipients
-            }],
-            queue='low',
-            routing_key='low'
+        recipients = User.objects.filter(
+            membership__company_id=ticket.company_association_id
+        ).filter(
+            Q(notification_setting__category__contains=[
+                ticket.category_id
+            ]) |
+            Q(notification_setting__issue_type__contains=[
+                ticket.issue_type_id
+            ])
+        ).values_list('email', flat=True)
+
+        send_notification(
+            subject_template='new_ticket/sub.txt',
+            email_template='new_ticket/for_staff.txt',
+            html_template='new_ticket/for_staff.html',
+            context=context,
+            to_email=list(recipients)
         )
     else:
-        send_notification_by_email.apply_async(
-            args=[{
-                'subject_template': 'new_ticket/note_sub.txt',
-                'email_template': 'new_ticket/note_for_user.txt',
-                'html_template': 'new_ticket/note_for_user.html',
-                'context': context,
-                'to_email': ticket.created_by.email
-            }],
-            queue='low',
-            routing_key='low'
+        send_notification(
+            subject_template='new_ticket/note_sub.txt',
+            email_template='new_ticket/note_for_user.txt',
+            html_template='new_ticket/note_for_user.html',
+            context=context,
+            to_email=ticket.created_by.email
         )
 
 
 def notify_ticket_reopened(ticket, user):
 
     context = gather_ticket_email_context(ticket)
-    context['ticket_reopened_by'] = user
+    context['ticket_reopened_by'] = as_text(user)
     context['ticket_reopened_by_comp'] = 'Company'
 
+    # notify ticket subscribers of the ticket reopeness
+    to_emails = list(ticket.subscribers.values_list('email', flat=True))
+
     # Notify assignee of the ticket reopeness
     if ticket.assignee and ticket.assignee != user:
-        send_notification_by_email.apply_async(
-            args=[{
-                'subject_template': 'new_ticket/reopened_sub.txt',
-                'email_template': 'new_ticket/reopened.txt',
-                'html_template': 'new_ticket/reopened.html',
-                'context': context,
-                'to_email': ticket.assignee.email
-            }],
-            queue='low',
-            routing_key='low'
-        )
+        to_emails.append(ticket.assignee.email)
 
-    # notify ticket subscribers of the ticket reopeness
-    subscribers = ticket.subscribers.values_list('email', flat=True)
-
-    send_notification_by_email.apply_async(
-        args=[{
-            'subject_template': 'new_ticket/reopened_sub.txt',
-            'email_template': 'new_ticket/reopened.txt',
-            'html_template': 'new_ticket/reopened.html',
-            'context': context,
-            'to_email': list(subscribers)
-        }],
-        queue='low',
-        routing_key='low'
+    send_notification(
+        subject_template='new_ticket/reopened_sub.txt',
+        email_template='new_ticket/reopened.txt',
+        html_template='new_ticket/reopened.html',
+        context=context,
+        to_email=to_emails
     )
 
 
 def notify_ticket_assigned(ticket, user):
+    if not ticket.assignee or ticket.assignee == user:
+        return
 
     context = gather_ticket_email_context(ticket)
-    context['ticket_assigned_by'] = user
-    context['ticket_assigned_to'] = ticket.assignee
+    context['ticket_assigned_by'] = as_text(user)
+    context['ticket_assigned_to'] = as_text(ticket.assignee)
     context['first_name'] = ticket.assignee.first_name
 
-    if ticket.assignee != user:
-        send_notification_by_email.apply_async(
-            args=[{
-                'subject_template': 'ticket_assigned/to_assignee_sub.txt',
-                'email_template': 'ticket_assigned/to_assignee.txt',
-                'html_template': 'ticket_assigned/to_assignee.html',
-                'context': context,
-                'to_email': ticket.assignee.email
-            }],
-            queue='low',
-            routing_key='low'
-        )
+    send_notification(
+        subject_template='ticket_assigned/to_assignee_sub.txt',
+        email_template='ticket_assigned/to_assignee.txt',
+        html_template='ticket_assigned/to_assignee.html',
+        context=context,
+        to_email=ticket.assignee.email
+    )
 
 
 def gather_answer_email_context(answer):
@@ -197,48 +211,46 @@ def notify_new_answer(answer):
             ticket.assignee.is_active):
         to_emails.append(ticket.assignee.email)
 
-    if to_emails:
-        send_notification_by_email.apply_async(
-            args=[{
-                'subject_template': 'new_answer/new_answer_sub.txt',
-                'email_template': 'new_answer/new_answer.txt',
-                'html_template': 'new_answer/new_answer.html',
-                'context': context,
-                'to_email': to_emails
-            }],
-            queue='low',
-            routing_key='low'
-        )
-
     # notify ticket subscribers of creating new answers
-    subscribers = ticket.subscribers.values_list('email', flat=True)
-    send_notification_by_email.apply_async(
-        args=[{
-            'subject_template': 'new_answer/new_answer_sub.txt',
-            'email_template': 'new_answer/new_answer.txt',
-            'html_template': 'new_answer/new_answer.html',
-            'context': context,
-            'to_email': list(subscribers)
-        }],
-        queue='low',
-        routing_key='low'
+    to_emails += ticket.subscribers.values_list('email', flat=True)
+
+    send_notification(
+        subject_template='new_answer/new_answer_sub.txt',
+        email_template='new_answer/new_answer.txt',
+        html_template='new_answer/new_answer.html',
+        context=context,
+        to_email=to_emails
     )
 
 
+def get_tagged_emails(body):
+    to_emails = []
+    tagged_users = re.findall(r'@[\w\.-]+', body)
+    for tagged_user in tagged_users:
+        name = tagged_user.replace('@', '').split('.')
+        if len(name) < 2:
+            continue
+
+        emails = User.objects.filter(
+            first_name__icontains=name[0],
+            last_name__icontains=name[1]
+        ).values_list('email', flat=True)
+
+        to_emails += list(emails)
+
+    return to_emails
+
+
 def notify_tagged_staff_member(answer, tagged_users):
 
     context = gather_answer_email_context(answer)
 
-    send_notification_by_email.apply_async(
-        args=[{
-            'subject_template': 'new_answer/tagged_staff_member_sub.txt',
-            'email_template': 'new_answer/tagged_staff_member.txt',
-            'html_template': 'new_answer/tagged_staff_member.html',
-            'context': context,
-            'to_email': tagged_users
-        }],
-        queue='low',
-        routing_key='low'
+    send_notification(
+        subject_template='new_answer/tagged_staff_member_sub.txt',
+        email_template='new_answer/tagged_staff_member.txt',
+        html_template='new_answer/tagged_staff_member.html',
+        context=context,
+        to_email=tagged_users
     )
 
 
@@ -251,14 +263,53 @@ def notify_invite(invitation):
         'existing': existing
     }
 
-    send_notification_by_email.apply_async(
-        args=[{
-            'subject_template': 'invite/named_sub.txt',
-            'email_template': 'invite/named.txt',
-            'html_template': 'invite/named.html',
-            'context': context,
-            'to_email': invitation.email
-        }],
-        queue='low',
-        routing_key='low'
+    send_notification(
+        subject_template='invite/named_sub.txt',
+        email_template='invite/named.txt',
+        html_template='invite/named.html',
+        context=context,
+        to_email=invitation.email
     )
+
+
+def handle_event(event):
+    """
+    Resolve the objects and recipients of a recorded notification event and
+    send its emails. Events whose objects are gone by now are dropped.
+    """
+    event_type = event['type']
+    actor = User.objects.filter(pk=event.get('actor_id')).first()
+
+    if event_type == constants.INVITATION_CREATED:
+        invitation = Invitation.objects.select_related(
+            'invited_by'
+        ).filter(pk=event['invitation_id']).first()
+        if invitation is not None:
+            notify_invite(invitation)
+        return
+
+    if event_type == constants.ANSWER_CREATED:
+        answer = Answer.objects.select_related(
+            'created_by', 'ticket__created_by', 'ticket__created_for',
+            'ticket__assignee'
+        ).filter(pk=event['answer_id']).first()
+        if answer is None:
+            return
+
+        notify_new_answer(answer)
+        notify_tagged_staff_member(answer, get_tagged_emails(answer.body))
+        return
+
+    # Bulk changes record one event for all the tickets involved
+    ticket_ids = event.get('ticket_ids') or [event['ticket_id']]
+    tickets = Ticket.objects.select_related(
+        'created_by', 'created_for', 'assignee', 'issue_type'
+    ).filter(pk__in=ticket_ids).order_by('pk')
+
+    for ticket in tickets:
+        if event_type == constants.TICKET_CREATED:
+            notify_new_ticket(ticket)
+        elif event_type == constants.TICKET_ASSIGNED:
+            notify_ticket_assigned(ticket, actor)
+        elif event_type == constants.TICKET_REOPENED:
+            notify_ticket_reopened(ticket, actor)
@@ -0,0 +1,93 @@
+from datetime import timedelta
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from info.models import TicketIssueType, TicketStatus
+from notification import constants
+from notification.models import ResponseTime, SLAReminder
+from tickets.models import Ticket, Answer
+
+
+def get_response_times(support_plan=constants.DEFAULT_SUPPORT_PLAN):
+    """
+    Response time in minutes of every issue type for a support plan.
+    Issue types without a configured ResponseTime get the default.
+    """
+    minutes = {}
+    for response_time in ResponseTime.objects.filter(
+            support_plan=support_plan):
+        slug = constants.SLA_ISSUE_TYPES.get(
+            response_time.issue_type, response_time.issue_type
+        )
+        minutes[slug] = response_time.response_time
+
+    return {
+        pk: minutes.get(slug, constants.DEFAULT_RESPONSE_TIME)
+        for pk, slug in TicketIssueType.objects.values_list('id', 'slug')
+    }
+
+
+def get_status_ids(slugs):
+    return list(
+        TicketStatus.objects.filter(slug__in=slugs).values_list(
+            'id', flat=True
+        )
+    )
+
+
+def overdue_tickets(kind, since_field, issue_type_ids=None,
+                    unanswered=False, now=None):
+    """
+    Active tickets whose `since_field` is older than the response time of
+    their issue type, and that got no `kind` reminder since then.
+
+    The response times are folded into the WHERE clause, so this is a
+    single query whatever the number of tickets.
+    """
+    now = now or timezone.now()
+
+    due = Q()
+    for issue_type_id, minutes in get_response_times().items():
+        if issue_type_ids is not None and issue_type_id not in issue_type_ids:
+            continue
+
+        due |= Q(**{
+            'issue_type_id': issue_type_id,
+            '{}__lte'.format(since_field): now - timedelta(minutes=minutes)
+        })
+
+    if not due:
+        return Ticket.objects.none()
+
+    queryset = Ticket.actives.filter(due).annotate(
+        reminded=Exists(SLAReminder.objects.filter(
+            ticket=OuterRef('pk'),
+            kind=kind,
+            sent_at__gte=OuterRef(since_field)
+        ))
+    ).filter(reminded=False)
+
+    if unanswered:
+        queryset = queryset.annotate(
+            answered=Exists(Answer.objects.filter(ticket=OuterRef('pk')))
+        ).filter(answered=False)
+
+    return queryset
+
+
+def in_chunks(queryset, size=constants.SLA_SCAN_CHUNK_SIZE):
+    last_pk = 0
+    while True:
+        chunk = list(queryset.filter(pk__gt=last_pk).order_by('pk')[:size])
+        if not chunk:
+            return
+
+        yield chunk
+        last_pk = chunk[-1].pk
+
+
+def record_reminders(tickets, kind):
+    sent_at = timezone.now()
+    SLAReminder.objects.bulk_create([
+        SLAReminder(ticket=ticket, kind=kind, sent_at=sent_at)
+        for ticket in tickets
+    ])
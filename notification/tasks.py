@@ -1,16 +1,26 @@
-from datetime import timedelta
 from django.conf import settings
-from django.utils import timezone
 from twilio.rest import Client
 from gluru_backend.celery import app
-from gluru_backend.utils import send_mail, generate_ticket_link
+from gluru_backend.utils import (
+    send_mail, generate_ticket_link, mail_batch, send_messages,
+    serialize_mail, deserialize_mail
+)
+from info import constants as info_constants
+from info.models import TicketIssueType
+from notification import constants
 from notification.models import SMSContact
-# from tickets.constants import NOTIFICATION_DELAY_TIME, SLA_MATRIX
+from notification.notifications import handle_event
+from notification.sla import (
+    overdue_tickets, get_status_ids, in_chunks, record_reminders
+)
 from tickets.models import Ticket
 
 
 client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
 
+MAIL_RETRY_DELAY = 60
+MAIL_MAX_RETRIES = 5
+
 
 @app.task
 def send_notification_by_email(context):
@@ -29,30 +39,54 @@ def send_notification_by_email(context):
     )
 
 
-@app.task
-def send_sms():
-    contacts = SMSContact.actives.all()
-    if not len(contacts):
-        return
+@app.task(bind=True, max_retries=MAIL_MAX_RETRIES)
+def retry_email_message(self, message):
+    failed = send_messages([deserialize_mail(message)])
+    if failed:
+        raise self.retry(
+            exc=failed[0][1],
+            countdown=MAIL_RETRY_DELAY * 2 ** self.request.retries
+        )
 
-    tickets = Ticket.actives.filter(
-        issue_type__in=['outage', 'impaired'],
-        status__in=['pending', 'inprogress', 'assigned', 'new'],
-        is_notified=False,
-    )
 
-    for ticket in tickets:
-        if len(ticket.answers.all()):
-            continue
+@app.task
+def process_notification_event(event):
+    with mail_batch() as outbox:
+        handle_event(event)
+
+    # Only the messages that failed are retried, each on its own backoff
+    for message, _ in send_messages(outbox):
+        retry_email_message.apply_async(
+            args=[serialize_mail(message)],
+            countdown=MAIL_RETRY_DELAY,
+            queue='low',
+            routing_key='low'
+        )
 
-        issue_type = ticket.issue_type
-        support_plan = 'Basic'
-        # delay_time = NOTIFICATION_DELAY_TIME[issue_type][support_plan]
-        delay_time = 30
-        time_diff = timezone.now() - ticket.created_at
 
-        if time_diff > timedelta(minutes=delay_time):
+@app.task
+def send_sms():
+    contacts = list(SMSContact.actives.all())
+    if not contacts:
+        return
 
+    tickets = overdue_tickets(
+        constants.SMS_REMINDER, 'created_at',
+        issue_type_ids=set(TicketIssueType.objects.filter(
+            priority=info_constants.HIGH_PRIORITY
+        ).values_list('id', flat=True)),
+        unanswered=True
+    ).filter(
+        # Tickets texted before SLAReminder was recorded
+        is_notified=False,
+        status_id__in=get_status_ids(
+            ['pending', 'inprogress', 'assigned', 'new']
+        )
+    ).select_related('created_by', 'issue_type')
+
+    for chunk in in_chunks(tickets):
+        notified = []
+        for ticket in chunk:
             text = """{} from {} has just opened a {} on Gluu support: {}
             Please respond ASAP.
             Thanks! - Gluu Team
@@ -61,45 +95,57 @@ def send_sms():
                 ticket.issue_type, generate_ticket_link(ticket.slug)
             )
 
+            sent = False
             for contact in contacts:
-                text = 'Hello ' + contact.name + ', ' + text
                 message = client.messages.create(
                     to=contact.number,
                     from_="+1 707 229 1094",
-                    body=text
+                    body='Hello ' + contact.name + ', ' + text
                 )
+                sent = sent or bool(message.sid)
 
-                if message.sid and not ticket.is_notified:
-                    ticket.is_notified = True
-                    ticket.save()
+            if sent:
+                notified.append(ticket)
+
+        record_reminders(notified, constants.SMS_REMINDER)
+        Ticket.objects.filter(
+            pk__in=[ticket.pk for ticket in notified]
+        ).update(is_notified=True)
 
 
 @app.task
 def email_reminder():
-    tickets = Ticket.actives.filter(
-        status__in=['assigned', 'new'],
-    )
+    support_plan = constants.DEFAULT_SUPPORT_PLAN
+    tickets = overdue_tickets(
+        constants.EMAIL_REMINDER, 'updated_at'
+    ).filter(
+        status_id__in=get_status_ids(['assigned', 'new'])
+    ).select_related('created_by', 'created_for')
+
+    for chunk in in_chunks(tickets):
+        with mail_batch() as outbox:
+            for ticket in chunk:
+                context = {
+                    'ticket': ticket,
+                    'ticket_link': generate_ticket_link(ticket.slug),
+                    'support_plan': support_plan
+                }
+
+                send_mail(
+                    subject_template='reminder/new_ticket_sub.txt',
+                    email_template='reminder/new_ticket.txt',
+                    html_template='reminder/new_ticket.html',
+                    context=context,
+                    to_email=settings.NOTIFICATIONS_RECIPIENT
+                )
 
-    for ticket in tickets:
-        # if ticket.owned_by.is_basic:
-        #     continue
-
-        support_plan = 'Basic'
-        # delay_time = SLA_MATRIX[support_plan][ticket.issue_type]
-        delay_time = 30
-        time_diff = timezone.now() - ticket.updated_at
-
-        if time_diff > timedelta(minutes=delay_time):
-            context = {
-                'ticket': ticket,
-                'ticket_link': generate_ticket_link(ticket.slug),
-                'support_plan': support_plan
-            }
-
-            send_mail(
-                subject_template='reminder/new_ticket_sub.txt',
-                email_template='reminder/new_ticket.txt',
-                html_template='reminder/new_ticket.html',
-                context=context,
-                to_email=settings.NOTIFICATIONS_RECIPIENT
-            )
+        # One message per ticket; tickets whose reminder failed are picked
+        # up again by the next scan
+        failed = {id(message) for message, _ in send_messages(outbox)}
+        record_reminders(
+            [
+                ticket for ticket, message in zip(chunk, outbox)
+                if id(message) not in failed
+            ],
+            constants.EMAIL_REMINDER
+        )
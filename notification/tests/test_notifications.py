@@ -0,0 +1,66 @@
+from unittest import mock
+from django.core.cache import cache
+from django.core.management import call_command
+from django.template import loader
+from rest_framework.test import APITestCase
+from gluru_backend.utils import render_mail
+from notification.notifications import gather_ticket_email_context
+from profiles.models import User
+from tickets.models import Ticket
+
+
+class RenderMailTest(APITestCase):
+
+    def setUp(self):
+        call_command('loaddata', 'data', verbosity=0)
+        cache.clear()
+
+        self.user = User.objects.create_user(
+            email='user@gmail.com',
+            password='levan'
+        )
+        self.ticket = Ticket.objects.create(
+            title='Oxauth crashes', body='**Stack** trace', status_id=1,
+            category_id=1, gluu_server='3.1.4', os='Ubuntu',
+            created_by=self.user
+        )
+
+    def render(self, context):
+        return render_mail(
+            subject_template='new_ticket/sub.txt',
+            email_template='new_ticket/for_staff.txt',
+            html_template='new_ticket/for_staff.html',
+            context=context
+        )
+
+    def test_render_mail(self):
+        """
+         - render the context of a ticket without issue type
+         - render a template set and context once
+         - render again once the context changed
+        """
+        context = gather_ticket_email_context(self.ticket)
+
+        # render the context of a ticket without issue type
+        rendered = self.render(context)
+        self.assertEqual(
+            rendered['subject'],
+            'New Gluu support ticket: #{} "Oxauth crashes"'.format(
+                self.ticket.id
+            )
+        )
+        self.assertIn('Issue Type: \n', rendered['body'])
+        self.assertIn('\nStack trace\n', rendered['body'])
+        self.assertNotIn('None', rendered['html'])
+
+        # render a template set and context once
+        with mock.patch.object(
+                loader, 'render_to_string',
+                wraps=loader.render_to_string) as render_to_string:
+            self.assertEqual(self.render(context), rendered)
+            render_to_string.assert_not_called()
+
+            # render again once the context changed
+            context['ticket_title'] = 'Oxauth restarts'
+            self.assertIn('Oxauth restarts', self.render(context)['subject'])
+            self.assertEqual(render_to_string.call_count, 3)
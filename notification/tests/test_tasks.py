@@ -0,0 +1,209 @@
+import json
+import smtplib
+from datetime import timedelta
+from unittest import mock
+from django.core import mail
+from django.core.mail import EmailMultiAlternatives
+from django.core.management import call_command
+from django.db import DatabaseError, transaction
+from django.test import SimpleTestCase
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from gluru_backend import utils
+from gluru_backend.testing import capture_on_commit_callbacks
+from gluru_backend.utils import (
+    send_mail, mail_batch, send_messages, serialize_mail, deserialize_mail,
+    close_mail_connection
+)
+from notification import constants
+from notification.models import SMSContact, SLAReminder
+from notification.tasks import send_sms
+from profiles.models import User
+from tickets.models import Ticket
+from tickets.tasks import update_search_index
+
+
+class SendSMSTest(APITestCase):
+
+    def setUp(self):
+        call_command('loaddata', 'data', verbosity=0)
+
+        self.user = User.objects.create_user(
+            email='user@gmail.com',
+            password='levan'
+        )
+        SMSContact.objects.create(name='support', number='+12025550100')
+
+        self.outage = Ticket.objects.create(
+            title='outage', body='body', status_id=1, category_id=1,
+            issue_type_id=1, gluu_server='3.1.4', os='Ubuntu',
+            created_by=self.user
+        )
+        self.notified = Ticket.objects.create(
+            title='notified', body='body', status_id=1, category_id=1,
+            issue_type_id=1, gluu_server='3.1.4', os='Ubuntu',
+            created_by=self.user, is_notified=True
+        )
+        self.minor = Ticket.objects.create(
+            title='minor', body='body', status_id=1, category_id=1,
+            issue_type_id=4, gluu_server='3.1.4', os='Ubuntu',
+            created_by=self.user
+        )
+        Ticket.objects.update(created_at=timezone.now() - timedelta(days=1))
+
+    @mock.patch('notification.tasks.client')
+    def test_send_sms(self, client):
+        """
+         - text overdue high priority tickets
+         - skip tickets texted before reminders were recorded
+         - text each ticket once
+        """
+        client.messages.create.return_value.sid = 'SM0'
+
+        # text overdue high priority tickets
+        send_sms()
+        self.assertEqual(client.messages.create.call_count, 1)
+        self.assertIn(
+            self.outage.slug, client.messages.create.call_args[1]['body']
+        )
+        self.assertTrue(Ticket.objects.get(pk=self.outage.pk).is_notified)
+
+        # skip tickets texted before reminders were recorded
+        self.assertFalse(SLAReminder.objects.filter(ticket=self.notified))
+
+        # text each ticket once
+        send_sms()
+        self.assertEqual(client.messages.create.call_count, 1)
+        self.assertEqual(
+            SLAReminder.objects.get().kind, constants.SMS_REMINDER
+        )
+
+
+class MailBatchTest(SimpleTestCase):
+
+    def setUp(self):
+        close_mail_connection()
+        self.addCleanup(close_mail_connection)
+
+    def send_invitation(self, to_email):
+        send_mail(
+            subject_template='invite/named_sub.txt',
+            email_template='invite/named.txt',
+            context={
+                'invited_by': 'Admin', 'company': 'Gluu',
+                'invitation_link': 'https://support.gluu.org/invite',
+                'existing': False
+            },
+            to_email=to_email
+        )
+
+    def test_send_batch(self):
+        """
+         - collect the messages of a batch
+         - send a batch over one connection
+         - retry a failed message on a fresh connection
+         - report a message failing twice
+        """
+        # collect the messages of a batch
+        with mail_batch() as outbox:
+            self.send_invitation('named@gluu.org')
+            self.send_invitation(['admin@gluu.org', 'user@gluu.org'])
+        self.assertEqual(len(outbox), 2)
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(
+            outbox[1].bcc, ['admin@gluu.org', 'user@gluu.org']
+        )
+
+        # send a batch over one connection
+        with mock.patch.object(
+                utils, 'get_connection',
+                wraps=utils.get_connection) as get_connection:
+            self.assertEqual(send_messages(outbox), [])
+            self.send_invitation('named@gluu.org')
+        self.assertEqual(len(mail.outbox), 3)
+        get_connection.assert_called_once_with()
+
+        # retry a failed message on a fresh connection
+        error = smtplib.SMTPServerDisconnected()
+        connection = utils.get_mail_connection()
+        with mock.patch.object(
+                connection, 'send_messages', side_effect=error):
+            self.assertEqual(send_messages(outbox[:1]), [])
+        self.assertIsNot(utils.get_mail_connection(), connection)
+        self.assertEqual(len(mail.outbox), 4)
+
+        # report a message failing twice
+        with mock.patch(
+                'django.core.mail.backends.locmem.EmailBackend.send_messages',
+                side_effect=[error, error, 1]):
+            self.assertEqual(send_messages(outbox), [(outbox[0], error)])
+        self.assertEqual(len(mail.outbox), 4)
+
+    def test_serialize_mail(self):
+        """
+         - keep every part of a message through JSON
+        """
+        message = EmailMultiAlternatives(
+            'Ticket updated', 'body', 'support@gluu.org', ['user@gluu.org'],
+            bcc=['staff@gluu.org'], cc=['named@gluu.org'],
+            reply_to=['admin@gluu.org'], headers={'X-Ticket': 'slug'},
+            alternatives=[('<p>body</p>', 'text/html')]
+        )
+        message.attach('invoice.pdf', b'%PDF-\xff', 'application/pdf')
+        message.attach('notes.txt', 'notes', 'text/plain')
+
+        # keep every part of a message through JSON
+        copy = deserialize_mail(json.loads(json.dumps(
+            serialize_mail(message)
+        )))
+        for part in [
+                'subject', 'body', 'from_email', 'to', 'cc', 'bcc',
+                'reply_to', 'extra_headers', 'alternatives', 'attachments']:
+            self.assertEqual(getattr(copy, part), getattr(message, part))
+
+
+class NotificationEventTest(APITestCase):
+
+    def setUp(self):
+        call_command('loaddata', 'data', verbosity=0)
+
+        self.user = User.objects.create_user(
+            email='user@gmail.com',
+            password='levan'
+        )
+
+    def create_ticket(self):
+        return Ticket.objects.create(
+            title='outage', body='body', status_id=1, category_id=1,
+            issue_type_id=1, gluu_server='3.1.4', os='Ubuntu',
+            created_by=self.user
+        )
+
+    @mock.patch.object(update_search_index, 'apply_async')
+    def test_send_event_on_commit(self, _):
+        """
+         - drop the event of a ticket created in a rolled back transaction
+         - send the event of a ticket created in a committed transaction
+        """
+        # drop the event of a ticket created in a rolled back transaction
+        with capture_on_commit_callbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    self.create_ticket()
+                    raise DatabaseError
+            except DatabaseError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertEqual(mail.outbox, [])
+
+        # send the event of a ticket created in a committed transaction
+        with capture_on_commit_callbacks(execute=True):
+            ticket = self.create_ticket()
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            sorted(['support@gluu.org', self.user.email])
+        )
+        self.assertTrue(all(
+            ticket.slug in message.body
+            for message in mail.outbox
+        ))
@@ -46,4 +46,6 @@ class JWTAuthentication(authentication.BaseAuthentication):
             msg = 'This user has been deactivated.'
             raise exceptions.AuthenticationFailed(msg)
 
+        user.load_principal()
+
         return user, token
@@ -7,7 +7,10 @@ from django.contrib.auth.models import (
     AbstractBaseUser, BaseUserManager, PermissionsMixin
 )
 from gluru_backend.models import TimestampedModel
-from info.models import UserRole
+from info.models import (
+    UserRole, get_permission_matrix, role_has_permission
+)
+from info.constants import STAFF_ROLE
 
 
 class UserManager(BaseUserManager):
@@ -92,20 +95,28 @@ class User(AbstractBaseUser, PermissionsMixin, TimestampedModel):
     def full_name(self):
         return self.first_name + ' ' + self.last_name
 
+    @property
+    def principal(self):
+        principal = getattr(self, '_principal', None)
+        return principal if principal is not None else Principal(self)
+
     @property
     def company(self):
-        membership = self.membership_set.filter(is_primary=True).first()
+        membership = self.principal.primary_membership
         return membership.company if membership else None
 
     @property
     def company_name(self):
-        membership = self.membership_set.filter(is_primary=True).first()
+        membership = self.principal.primary_membership
         return membership.company.name if membership else ''
 
     @property
     def companies(self):
-        membership = self.membership_set.all().order_by('-is_primary')
-        return list(m.company for m in membership)
+        return self.principal.companies
+
+    def load_principal(self):
+        self._principal = Principal(self)
+        return self._principal
 
     def _generate_jwt_token(self):
         valid_time = datetime.now() + timedelta(days=60)
@@ -287,3 +298,69 @@ class Invitation(TimestampedModel):
 
     class Meta:
         unique_together = ['company', 'email']
+
+
+class Principal(object):
+    """
+    Memberships and roles of a user, loaded once and shared by the permission
+    classes and queryset helpers handling the same request
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.memberships = list(
+            Membership.objects.filter(
+                user=user
+            ).select_related(
+                'company'
+            ).order_by(
+                '-is_primary'
+            )
+        ) if user.pk else []
+        self.roles = {
+            membership.company_id: membership.role_id
+            for membership in self.memberships
+        }
+
+    @property
+    def company_ids(self):
+        return [membership.company_id for membership in self.memberships]
+
+    @property
+    def companies(self):
+        return [membership.company for membership in self.memberships]
+
+    @property
+    def primary_membership(self):
+        for membership in self.memberships:
+            if membership.is_primary:
+                return membership
+        return None
+
+    @property
+    def staff_role_id(self):
+        if not self.user.is_staff:
+            return None
+        return get_permission_matrix()['roles'].get(STAFF_ROLE)
+
+    def role_id(self, company_id):
+        return self.roles.get(company_id)
+
+    def is_member(self, company_id):
+        return company_id in self.roles
+
+    def has_permission(self, company_id, app_name, model_name, action):
+        return role_has_permission(
+            self.roles.get(company_id), app_name, model_name, action
+        )
+
+    def has_staff_permission(self, app_name, model_name, action):
+        return role_has_permission(
+            self.staff_role_id, app_name, model_name, action
+        )
+
+    def permitted_company_ids(self, app_name, model_name, action):
+        return [
+            company_id for company_id, role_id in self.roles.items()
+            if role_has_permission(role_id, app_name, model_name, action)
+        ]
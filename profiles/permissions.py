@@ -1,5 +1,4 @@
 from rest_framework import permissions
-from info.models import UserRole
 
 
 class IsVisitor(permissions.BasePermission):
@@ -40,24 +39,21 @@ class CompanyCustomPermission(permissions.BasePermission):
         if request.user.is_superuser:
             return True
 
+        principal = request.user.principal
         staff_permission = False
 
         if request.user.is_staff:
-            staff_role = UserRole.objects.get(name='staff')
             staff_permission = request.method in permissions.SAFE_METHODS or\
-                staff_role.has_permission(
+                principal.has_staff_permission(
                     app_name='profiles',
                     model_name='Company',
                     action=view.action
                 )
 
-        membership = request.user.membership_set.filter(
-            company=obj
-        ).first()
-
-        membership_permission = membership and membership.role and (
+        membership_permission = principal.role_id(obj.id) and (
             request.method in permissions.SAFE_METHODS or
-            membership.role.has_permission(
+            principal.has_permission(
+                obj.id,
                 app_name='profiles',
                 model_name='Company',
                 action=view.action
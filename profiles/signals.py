@@ -1,6 +1,7 @@
 from django.dispatch import receiver
 from django.db.models.signals import post_save
-from notification.notifications import notify_invite
+from notification import constants
+from notification.events import record_event
 from profiles.models import Invitation
 
 
@@ -9,4 +10,8 @@ def invitation_saved(sender, instance, created, **kwargs):
     if not created:
         return
 
-    notify_invite(instance)
+    record_event(
+        constants.INVITATION_CREATED,
+        actor=instance.invited_by,
+        invitation_id=instance.pk
+    )
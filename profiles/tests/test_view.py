@@ -1,6 +1,8 @@
 import json
+from django.db import connection
 from django.urls import reverse
 from django.core.management import call_command
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework.test import APITestCase
 from djangorestframework_camel_case.util import camelize
@@ -359,6 +361,41 @@ class CompanyViewSetTest(APITestCase):
             response.data['results'], camelize(company_serializer.data)
         )
 
+    def test_ticket_creatable_companies(self):
+        """
+         - list ticket creatable companies by gluu named user
+         - list ticket creatable companies by gluu&openiam named user
+        """
+        gluu_named_openiam_named = User.objects.create_user(
+            email='named@mixed.com',
+            password='levan'
+        )
+        Membership.objects.create(
+            company=self.gluu, user=gluu_named_openiam_named,
+            role=self.role_named
+        )
+        Membership.objects.create(
+            company=self.openiam, user=gluu_named_openiam_named,
+            role=self.role_named
+        )
+
+        query_counts = []
+        for user, count in [
+                (self.gluu_named, 1), (gluu_named_openiam_named, 2)]:
+            self.client.credentials(HTTP_AUTHORIZATION='Token ' + user.token)
+            url = reverse('profiles:company-ticket-creatable-companies')
+            self.client.get(url)
+
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response.data['results']), count)
+            query_counts.append(len(queries))
+
+        # membership lookups do not grow with the number of companies
+        self.assertEqual(query_counts[0], query_counts[1])
+
     def test_update_company(self):
         """
          - update company info by non permission users
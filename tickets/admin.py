@@ -11,8 +11,7 @@ class TicketsHistoryInlineAdmin(admin.StackedInline):
 
     fieldsets = (
         (_('Base'), {'fields': (
-            ('changed_by', 'changed_field'),
-            ('before_value', 'after_value'))}),
+            ('changed_by', 'changes'))}),
     )
 
     def has_add_permission(self, request, obj=None):
@@ -83,16 +82,15 @@ class TicketAdmin(admin.ModelAdmin):
 @admin.register(TicketHistory)
 class TicketHistoryAdmin(admin.ModelAdmin):
     list_display = (
-        'ticket', 'changed_by', 'changed_field', 'created_at'
+        'ticket', 'changed_by', 'created_at'
     )
 
-    search_fields = ('ticket', 'chaged_field')
+    search_fields = ('ticket__title', )
 
     list_display_links = ['ticket', ]
 
     readonly_fields = (
-        'ticket', 'changed_by', 'changed_field',
-        'before_value', 'after_value'
+        'ticket', 'changed_by', 'changes'
     )
 
     def has_add_permission(self, request, obj=None):
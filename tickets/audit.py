@@ -0,0 +1,69 @@
+import threading
+import weakref
+from django.db import connection, transaction
+from tickets.models import TicketHistory
+
+
+_local = threading.local()
+
+
+class HistoryBatch(object):
+    """
+    Ticket history records of one transaction, written by a single
+    INSERT once it commits
+    """
+
+    def __init__(self, savepoint_ids, records):
+        self.savepoint_ids = savepoint_ids
+        self.records = records
+
+    def __call__(self):
+        open_batches = get_open_batches()
+        if open_batches.get(self.savepoint_ids) is self:
+            del open_batches[self.savepoint_ids]
+
+        TicketHistory.objects.bulk_create(self.records)
+
+
+def get_open_batches():
+    """
+    Batches of the current thread not written yet, by the savepoint ids of
+    the block they were opened in. Django drops the on_commit callbacks of
+    a block rolled back, and the batches only referenced here with them.
+    """
+    try:
+        return _local.open_batches
+    except AttributeError:
+        _local.open_batches = weakref.WeakValueDictionary()
+        return _local.open_batches
+
+
+def record_changes(ticket_id, changed_by_id, changes):
+    """
+    Record the {field: [before, after]} changes of one save of a ticket
+    or answer. Call it once the save succeeded: the record is written
+    when the transaction commits, along with the other ones of the same
+    savepoint.
+    """
+    if not changes:
+        return
+
+    record = TicketHistory(
+        ticket_id=ticket_id,
+        changed_by_id=changed_by_id,
+        changes=changes
+    )
+
+    if not connection.in_atomic_block:
+        transaction.on_commit(HistoryBatch((), [record]))
+        return
+
+    savepoint_ids = tuple(connection.savepoint_ids)
+    open_batches = get_open_batches()
+    batch = open_batches.get(savepoint_ids)
+    if batch is not None:
+        batch.records.append(record)
+    else:
+        batch = HistoryBatch(savepoint_ids, [record])
+        open_batches[savepoint_ids] = batch
+        transaction.on_commit(batch)
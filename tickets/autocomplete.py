@@ -0,0 +1,176 @@
+import re
+import threading
+import time
+from datetime import timedelta
+from bisect import bisect_left, insort
+from tickets import constants
+from tickets.models import Ticket
+
+
+def get_terms(title, slug):
+    terms = set(re.findall(r'\w+', title.lower()))
+    terms.add(slug)
+    return terms
+
+
+class TitleIndex(object):
+    """
+    Per-process prefix index over the words of active ticket titles and
+    their slugs, for autocomplete that touches neither the search index
+    nor the database on a keystroke.
+
+    The index is built when the web process starts, or on first use, and
+    kept current by the ticket signals of this process once their
+    transaction commits. Changes made by other processes are picked up
+    with one query on updated_at at most every AUTOCOMPLETE_SYNC seconds.
+    That query reaches AUTOCOMPLETE_SYNC_OVERLAP seconds back, for rows
+    committed after a newer one with an older updated_at.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.terms = []
+        self.entries = {}
+        self.built = False
+        self.synced_at = 0
+        self.last_updated_at = None
+
+    def build(self):
+        with self.lock:
+            self.terms = []
+            self.entries = {}
+            self.last_updated_at = None
+
+            # Sort once instead of inserting term by term
+            terms = []
+            for pk, title, slug, company_id, is_private, updated_at in \
+                    Ticket.actives.values_list(
+                        'id', 'title', 'slug', 'company_association_id',
+                        'is_private', 'updated_at'
+                    ).iterator():
+                entry_terms = get_terms(title, slug)
+                self.entries[pk] = (
+                    title, slug, company_id, is_private, entry_terms
+                )
+                terms.extend((term, pk) for term in entry_terms)
+                if self.last_updated_at is None or \
+                        updated_at > self.last_updated_at:
+                    self.last_updated_at = updated_at
+
+            terms.sort()
+            self.terms = terms
+            self.built = True
+            self.synced_at = time.monotonic()
+
+    def load(self, queryset):
+        rows = queryset.values_list(
+            'id', 'title', 'slug', 'company_association_id', 'is_private',
+            'is_deleted', 'updated_at'
+        )
+        for pk, title, slug, company_id, is_private, is_deleted, updated_at \
+                in rows:
+            if is_deleted:
+                self.remove(pk)
+            else:
+                self.add(pk, title, slug, company_id, is_private)
+
+            if self.last_updated_at is None or \
+                    updated_at > self.last_updated_at:
+                self.last_updated_at = updated_at
+
+    def sync(self):
+        if not self.built:
+            self.build()
+            return
+
+        if time.monotonic() - self.synced_at < constants.AUTOCOMPLETE_SYNC:
+            return
+
+        with self.lock:
+            self.synced_at = time.monotonic()
+            queryset = Ticket.objects.all()
+            if self.last_updated_at is not None:
+                queryset = queryset.filter(
+                    updated_at__gt=self.last_updated_at - timedelta(
+                        seconds=constants.AUTOCOMPLETE_SYNC_OVERLAP
+                    )
+                )
+            self.load(queryset)
+
+    def add(self, pk, title, slug, company_id, is_private):
+        with self.lock:
+            self.remove(pk)
+            terms = get_terms(title, slug)
+            self.entries[pk] = (title, slug, company_id, is_private, terms)
+            for term in terms:
+                insort(self.terms, (term, pk))
+
+    def remove(self, pk):
+        with self.lock:
+            entry = self.entries.pop(pk, None)
+            if entry is None:
+                return
+
+            for term in entry[4]:
+                i = bisect_left(self.terms, (term, pk))
+                if i < len(self.terms) and self.terms[i] == (term, pk):
+                    del self.terms[i]
+
+    def update_ticket(self, ticket):
+        if not self.built:
+            return
+
+        if ticket.is_deleted:
+            self.remove(ticket.pk)
+        else:
+            self.add(
+                ticket.pk, ticket.title, ticket.slug,
+                ticket.company_association_id, ticket.is_private
+            )
+
+    def prefix_matches(self, prefix):
+        matches = set()
+        i = bisect_left(self.terms, (prefix, 0))
+        while i < len(self.terms) and self.terms[i][0].startswith(prefix):
+            matches.add(self.terms[i][1])
+            i += 1
+        return matches
+
+    def search(self, query, company_ids=None, public_only=False,
+               limit=constants.AUTOCOMPLETE_LIMIT):
+        """
+        Tickets having a title word or slug starting with every word of
+        query, newest first. company_ids and public_only restrict the
+        results like get_tickets_query does.
+        """
+        words = re.findall(r'\w+', query.lower())
+        if not words:
+            return []
+
+        self.sync()
+
+        with self.lock:
+            matches = None
+            for word in words:
+                found = self.prefix_matches(word)
+                matches = found if matches is None else matches & found
+                if not matches:
+                    return []
+
+            results = []
+            for pk in sorted(matches, reverse=True):
+                title, slug, company_id, is_private, _ = self.entries[pk]
+                if public_only and (company_id is not None or is_private):
+                    continue
+                if company_ids is not None and company_id is not None and \
+                        company_id not in company_ids:
+                    continue
+
+                results.append({'id': pk, 'title': title, 'slug': slug})
+                if len(results) == limit:
+                    break
+
+            return results
+
+
+title_index = TitleIndex()
@@ -0,0 +1,81 @@
+from django.db import transaction
+from django.utils import timezone
+from info.models import TicketStatus
+from notification import constants as notification_constants
+from notification.events import record_event
+from tickets import constants
+from tickets.audit import record_changes
+from tickets.models import Ticket
+from tickets.tasks import queue_tickets_index
+
+
+def update_tickets(tickets, changes, updated_by):
+    """
+    Apply changes, {field: value} of BULK_FIELDS, to the tickets of a
+    queryset with a single UPDATE. History, search index and notifications
+    follow as if each ticket had been saved, in one batch each.
+
+    Returns the ids of the tickets that changed.
+    """
+    values = {
+        field: getattr(value, 'pk', value)
+        for field, value in changes.items()
+    }
+    columns = [Ticket._meta.get_field(field).attname for field in values]
+    closed_ids = set(
+        TicketStatus.objects.filter(slug='close').values_list(
+            'id', flat=True
+        )
+    )
+
+    with transaction.atomic():
+        changed = {}
+        for pk, *old_values in tickets.select_for_update().values_list(
+                'pk', *columns):
+            ticket_changes = {
+                field: [old, values[field]]
+                for field, old in zip(values, old_values)
+                if old != values[field]
+            }
+            if ticket_changes:
+                changed[pk] = ticket_changes
+
+        if not changed:
+            return []
+
+        ticket_ids = list(changed)
+        Ticket.objects.filter(pk__in=ticket_ids).update(
+            updated_by=updated_by,
+            updated_at=timezone.now(),
+            **changes
+        )
+
+        # Joined into one INSERT by record_changes
+        for pk, ticket_changes in changed.items():
+            record_changes(pk, updated_by.pk, {
+                field: change for field, change in ticket_changes.items()
+                if field in constants.HISTORY_FIELDS
+            })
+
+        transaction.on_commit(lambda: queue_tickets_index(ticket_ids))
+
+        assigned = [pk for pk in ticket_ids if 'assignee' in changed[pk]]
+        if assigned:
+            record_event(
+                notification_constants.TICKET_ASSIGNED,
+                actor=updated_by,
+                ticket_ids=assigned
+            )
+
+        reopened = [
+            pk for pk in ticket_ids
+            if changed[pk].get('status', [None])[0] in closed_ids
+        ]
+        if reopened:
+            record_event(
+                notification_constants.TICKET_REOPENED,
+                actor=updated_by,
+                ticket_ids=reopened
+            )
+
+    return ticket_ids
@@ -0,0 +1,66 @@
+SEARCH_INDEX_QUEUE = 'search'
+SEARCH_INDEX_DELAY = 5
+SEARCH_INDEX_BATCH_SIZE = 200
+SEARCH_INDEX_SCHEDULED_KEY = 'tickets:search-index:scheduled'
+SEARCH_INDEX_SCHEDULED_TIMEOUT = 60
+
+HAYSTACK_SEARCH = 'haystack'
+POSTGRES_SEARCH = 'postgres'
+SEARCH_CONFIG = 'english'
+
+AUTOCOMPLETE_SYNC = 10
+# Longest a ticket save is expected to stay uncommitted
+AUTOCOMPLETE_SYNC_OVERLAP = 60
+AUTOCOMPLETE_LIMIT = 10
+
+TICKET_FACETS = [
+    'category', 'status', 'issue_type', 'gluu_server', 'os', 'assignee',
+    'company'
+]
+FACET_COUNTS_KEY = 'ticket_facets:{}:{}'
+FACET_COUNTS_TIMEOUT = 60
+
+SLUG_ATTEMPTS = 5
+
+UPLOAD_MAX_SIZE = 2 * 1024 ** 3
+UPLOAD_CHUNK_MAX_SIZE = 8 * 1024 ** 2
+UPLOAD_BLOCK_SIZE = 64 * 1024
+UPLOAD_SESSION_TTL = 24 * 60 * 60
+
+SENDFILE_NGINX = 'nginx'
+SENDFILE_APACHE = 'apache'
+
+# Ticket fields whose changes are kept in the ticket history
+HISTORY_FIELDS = [
+    'assignee', 'status', 'is_deleted', 'issue_type', 'title', 'body',
+    'created_for'
+]
+
+BULK_FIELDS = ['status', 'assignee', 'category', 'issue_type']
+BULK_FILTERS = [
+    'status', 'assignee', 'category', 'issue_type', 'created_by',
+    'company_association'
+]
+BULK_MAX_TICKETS = 1000
+
+# Ticket fields that, with updated_at at index 1, tell whether the
+# representation of a ticket changed
+TICKET_VERSION_FIELDS = [
+    'id', 'updated_at', 'response_no', 'vote_no', 'subscriber_no',
+    'attachment_no'
+]
+ANSWER_VERSION_FIELDS = ['id', 'updated_at']
+
+# Watermarks of the voter and subscriber lists, which change without
+# moving updated_at
+TICKET_MEMBER_VERSION_FIELDS = ['voters_version', 'subscribers_version']
+
+# Latest history records returned with a ticket thread
+THREAD_HISTORY_SIZE = 10
+# Capabilities of the caller on a ticket thread, as (model, action)
+THREAD_CAPABILITIES = {
+    'respond': ('Answer', 'create'),
+    'update': ('Ticket', 'update'),
+    'assign': ('Ticket', 'assign'),
+    'delete': ('Ticket', 'destroy')
+}
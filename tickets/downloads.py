@@ -0,0 +1,118 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+from django.conf import settings
+from django.http import (
+    FileResponse, HttpResponse, StreamingHttpResponse
+)
+from tickets import constants
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def get_byte_range(header, size):
+    """
+    (start, end) of the single byte range of a Range header, end included.
+    None when the whole file is to be sent, which is how a header that is
+    malformed or asks for several ranges is answered. Raises ValueError
+    when the range lies past the end of the file.
+    """
+    match = RANGE_RE.match(header.replace(' ', '')) if header else None
+    if match is None:
+        return None
+
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # Suffix range, the last bytes of the file
+        length = int(last)
+        if not length or not size:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size:
+        raise ValueError(header)
+    if start > end:
+        return None
+
+    return start, end
+
+
+def read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length:
+            block = f.read(min(length, constants.UPLOAD_BLOCK_SIZE))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+
+
+def get_content_disposition(filename):
+    try:
+        filename.encode('ascii')
+        return 'attachment; filename="{}"'.format(
+            filename.replace('\\', '\\\\').replace('"', '\\"')
+        )
+    except UnicodeEncodeError:
+        return "attachment; filename*=utf-8''{}".format(quote(filename))
+
+
+def serve_document(request, document, filename):
+    """
+    Response sending the file of document under filename. With
+    SENDFILE_BACKEND set, the front-end server is told to send the file
+    itself; otherwise the file is streamed, honouring a single byte Range.
+    """
+    name = document.file.name
+    path = document.file.path
+    content_type = mimetypes.guess_type(filename)[0] or \
+        'application/octet-stream'
+
+    if settings.SENDFILE_BACKEND == constants.SENDFILE_NGINX:
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = quote(
+            settings.SENDFILE_URL.rstrip('/') + '/' + name.lstrip('/')
+        )
+    elif settings.SENDFILE_BACKEND == constants.SENDFILE_APACHE:
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+    else:
+        if not os.path.exists(path):
+            return HttpResponse(status=404)
+
+        size = os.path.getsize(path)
+        try:
+            byte_range = get_byte_range(request.META.get('HTTP_RANGE'), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = 'bytes */{}'.format(size)
+            return response
+
+        if byte_range is None:
+            response = FileResponse(
+                open(path, 'rb'),
+                content_type=content_type
+            )
+            response['Content-Length'] = size
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                read_range(path, start, end - start + 1),
+                status=206,
+                content_type=content_type
+            )
+            response['Content-Range'] = 'bytes {}-{}/{}'.format(
+                start, end, size
+            )
+            response['Content-Length'] = end - start + 1
+
+        response['Accept-Ranges'] = 'bytes'
+
+    response['Content-Disposition'] = get_content_disposition(filename)
+    return response
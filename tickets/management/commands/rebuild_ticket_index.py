@@ -0,0 +1,237 @@
+import json
+import logging
+import os
+import shutil
+from multiprocessing import Pool, cpu_count
+
+from django import db
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from haystack import connections
+from haystack.backends.whoosh_backend import WhooshSearchBackend
+from haystack.exceptions import SkipDocument
+from whoosh.filedb.filestore import FileStorage
+from whoosh.index import TOC, clean_files
+
+from tickets.models import Ticket
+
+
+logger = logging.getLogger('django')
+
+CHUNK_SIZE = 1000
+REBUILD_DIR = 'ticket_rebuild'
+STATE_FILE = 'state.json'
+
+
+def get_backend(using):
+    backend = connections[using].get_backend()
+    if not backend.setup_complete:
+        backend.setup()
+    return backend
+
+
+def index_chunk(args):
+    """
+    Prepare and analyze the documents of the tickets with a pk in
+    [start, end) into an index of their own, so that workers never wait
+    on the lock of the main index
+    """
+    using, start, end, path = args
+    index = connections[using].get_unified_index().get_index(Ticket)
+    backend = get_backend(using)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+    writer = FileStorage(path).create_index(
+        backend.schema,
+        indexname=backend.index.indexname
+    ).writer()
+
+    count = 0
+    for ticket in index.index_queryset(using=using).filter(
+            pk__gte=start, pk__lt=end).order_by():
+        try:
+            document = index.full_prepare(ticket)
+        except SkipDocument:
+            continue
+
+        # Document boosts aren't supported by Whoosh
+        document.pop('boost', None)
+        writer.add_document(**{
+            key: backend._from_python(value)
+            for key, value in document.items()
+        })
+        count += 1
+
+    writer.commit(merge=False)
+    return start, count, path
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the ticket search index in parallel. Tickets are split in pk
+    ranges, each one indexed by a pool process into an index of its own
+    whose segment is then merged into the main index. Merged ranges are
+    recorded, so an interrupted rebuild can continue with --resume.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=cpu_count(),
+            help='Number of indexing processes'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_SIZE,
+            help='Width of the ticket pk ranges'
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Continue an interrupted rebuild instead of starting over'
+        )
+        parser.add_argument(
+            '--optimize',
+            action='store_true',
+            help='Merge all segments into one at the end, which is serial'
+        )
+        parser.add_argument(
+            '--using',
+            default='default',
+            help='Haystack connection to rebuild'
+        )
+
+    def load_state(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save_state(self, path, state):
+        with open(path + '.tmp', 'w') as f:
+            json.dump(state, f)
+        os.replace(path + '.tmp', path)
+
+    def merge_chunk(self, backend, path, start, state, state_path):
+        """
+        Move the segment files of a chunk into the main index and add them
+        to its table of contents, the way Whoosh's own multiprocess writer
+        does, instead of merging postings document by document
+        """
+        chunk = FileStorage(path).open_index(backend.index.indexname)
+        segments = chunk._read_toc().segments
+        segment_ids = {segment.segment_id() for segment in segments}
+
+        for filename in os.listdir(path):
+            if filename.split('.')[0] in segment_ids:
+                os.replace(
+                    os.path.join(path, filename),
+                    os.path.join(backend.path, filename)
+                )
+
+        state['pending'] = {'start': start, 'segments': sorted(segment_ids)}
+        self.save_state(state_path, state)
+
+        index = backend.index.refresh()
+        lock = index.lock('WRITELOCK')
+        lock.acquire(blocking=True)
+        try:
+            toc = index._read_toc()
+            generation = toc.generation + 1
+            TOC(toc.schema, toc.segments + segments, generation).write(
+                index.storage, index.indexname
+            )
+            clean_files(
+                index.storage, index.indexname, generation,
+                toc.segments + segments
+            )
+        finally:
+            lock.release()
+
+        del state['pending']
+        state['done'].append(start)
+        self.save_state(state_path, state)
+        shutil.rmtree(path)
+
+    def resume_pending(self, backend, state):
+        """
+        Count a chunk interrupted while being merged as done if its
+        segments made it into the main index
+        """
+        pending = state.pop('pending', None)
+        if pending is None:
+            return
+
+        segment_ids = {
+            segment.segment_id()
+            for segment in backend.index.refresh()._read_toc().segments
+        }
+        if segment_ids.issuperset(pending['segments']):
+            state['done'].append(pending['start'])
+
+    def handle(self, *args, **options):
+        using = options['using']
+        backend = get_backend(using)
+        if not isinstance(backend, WhooshSearchBackend):
+            raise CommandError(
+                'Only the whoosh engine is supported, use rebuild_index '
+                '--workers for other engines'
+            )
+
+        rebuild_dir = os.path.join(backend.path, REBUILD_DIR)
+        state_path = os.path.join(rebuild_dir, STATE_FILE)
+        state = self.load_state(state_path) if options['resume'] else None
+        if state is not None:
+            self.resume_pending(backend, state)
+        else:
+            shutil.rmtree(rebuild_dir, ignore_errors=True)
+            os.makedirs(rebuild_dir)
+            backend.clear(models=[Ticket])
+            state = {'chunk_size': options['chunk_size'], 'done': []}
+
+        # Chunks of a resumed rebuild keep the bounds it started with
+        index = connections[using].get_unified_index().get_index(Ticket)
+        bounds = index.index_queryset(using=using).aggregate(
+            first=Min('pk'),
+            last=Max('pk')
+        )
+        if bounds['first'] is None:
+            shutil.rmtree(rebuild_dir)
+            logger.info('No tickets to index')
+            return
+
+        state.setdefault('first', bounds['first'])
+        self.save_state(state_path, state)
+
+        chunk_size = state['chunk_size']
+        done = set(state['done'])
+        chunks = [
+            (
+                using, start, start + chunk_size,
+                os.path.join(rebuild_dir, str(start))
+            )
+            for start in range(state['first'], bounds['last'] + 1, chunk_size)
+            if start not in done
+        ]
+        total = len(chunks) + len(done)
+
+        # Forked workers must not share the connection of this process
+        db.connections.close_all()
+
+        with Pool(options['workers']) as pool:
+            for start, count, path in pool.imap_unordered(
+                    index_chunk, chunks):
+                self.merge_chunk(backend, path, start, state, state_path)
+                logger.info('Indexed {} tickets, chunk {}/{}'.format(
+                    count, len(state['done']), total
+                ))
+
+        shutil.rmtree(rebuild_dir)
+        if options['optimize']:
+            backend.index.refresh().optimize()
+
+        logger.info('Rebuilt the ticket index in {} chunks'.format(total))
@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Func, IntegerField, OuterRef, Q, Subquery
+
+from tickets.models import Answer, Attachments, Ticket
+
+
+CHUNK_SIZE = 500
+
+
+def count_of(queryset):
+    return Subquery(
+        queryset.order_by().annotate(
+            count=Func(F('pk'), function='COUNT')
+        ).values('count'),
+        output_field=IntegerField()
+    )
+
+
+class Command(BaseCommand):
+    """
+    Recount the denormalized Ticket counters (answers, votes, subscribers,
+    attachments) from their source tables and fix the tickets that drifted.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many tickets have drifted counters'
+        )
+
+    def get_counts(self):
+        ticket = OuterRef('pk')
+        return {
+            'response_no': count_of(
+                Answer.objects.filter(ticket=ticket, is_deleted=False)
+            ),
+            'vote_no': count_of(
+                Ticket.voters.through.objects.filter(ticket=ticket)
+            ),
+            'subscriber_no': count_of(
+                Ticket.subscribers.through.objects.filter(ticket=ticket)
+            ),
+            'attachment_no': count_of(
+                Attachments.objects.filter(
+                    Q(ticket=ticket) | Q(answer__ticket=ticket)
+                )
+            ),
+        }
+
+    def handle(self, *args, **options):
+        counts = self.get_counts()
+
+        drifted = Q()
+        for field in counts:
+            drifted |= ~Q(**{field: F('actual_{}'.format(field))})
+
+        pks = list(
+            Ticket.objects.annotate(**{
+                'actual_{}'.format(field): count
+                for field, count in counts.items()
+            }).filter(drifted).values_list('pk', flat=True)
+        )
+
+        if options['dry_run']:
+            self.stdout.write(
+                '{} tickets have drifted counters'.format(len(pks))
+            )
+            return
+
+        for i in range(0, len(pks), CHUNK_SIZE):
+            Ticket.objects.filter(pk__in=pks[i:i + CHUNK_SIZE]).update(
+                **counts
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            'Reconciled counters of {} tickets'.format(len(pks))
+        ))
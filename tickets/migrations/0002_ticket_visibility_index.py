@@ -0,0 +1,17 @@
+# Generated by Django 2.1.4 on 2026-10-18 11:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['is_deleted', 'company_association', 'created_at'], name='ticket_visibility_idx'),
+        ),
+    ]
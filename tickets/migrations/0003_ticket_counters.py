@@ -0,0 +1,28 @@
+# Generated by Django 2.1.4 on 2026-10-18 11:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0002_ticket_visibility_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='attachment_no',
+            field=models.IntegerField(blank=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='subscriber_no',
+            field=models.IntegerField(blank=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='vote_no',
+            field=models.IntegerField(blank=True, default=0),
+        ),
+    ]
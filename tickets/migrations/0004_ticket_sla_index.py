@@ -0,0 +1,17 @@
+# Generated by Django 2.1.4 on 2026-10-18 11:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0003_ticket_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['is_deleted', 'status', 'updated_at'], name='ticket_sla_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 2.1.4 on 2026-10-18 11:34
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+FILL_SEARCH_VECTORS = """
+UPDATE tickets_ticket SET search_vector =
+    setweight(to_tsvector('english', COALESCE(title, '')), 'A') ||
+    setweight(to_tsvector('english', COALESCE(body, '')), 'B') ||
+    setweight(to_tsvector('english', COALESCE((
+        SELECT string_agg(body, ' ') FROM tickets_answer
+        WHERE tickets_answer.ticket_id = tickets_ticket.id
+        AND NOT tickets_answer.is_deleted
+    ), '')), 'C')
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0005_pendingindexupdate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='ticket_search_idx'),
+        ),
+        migrations.RunSQL(
+            sql=FILL_SEARCH_VECTORS,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 2.1.4 on 2026-10-18 12:05
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations
+
+
+FILL_CHANGES = """
+UPDATE tickets_tickethistory SET changes =
+    jsonb_build_object(
+        changed_field, jsonb_build_array(before_value, after_value)
+    )
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0006_ticket_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tickethistory',
+            name='changes',
+            field=django.contrib.postgres.fields.jsonb.JSONField(default=dict),
+        ),
+        migrations.RunSQL(
+            sql=FILL_CHANGES,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RemoveField(
+            model_name='tickethistory',
+            name='after_value',
+        ),
+        migrations.RemoveField(
+            model_name='tickethistory',
+            name='before_value',
+        ),
+        migrations.RemoveField(
+            model_name='tickethistory',
+            name='changed_field',
+        ),
+    ]
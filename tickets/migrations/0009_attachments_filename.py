@@ -0,0 +1,30 @@
+# Generated by Django 2.1.4 on 2026-10-18 13:30
+
+from django.db import migrations, models
+
+
+FILL_FILENAME = """
+UPDATE tickets_attachments SET filename =
+    regexp_replace(tickets_document.file, '^.*/', '')
+FROM tickets_document
+WHERE tickets_document.id = tickets_attachments.document_id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0008_upload_sessions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attachments',
+            name='filename',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.RunSQL(
+            sql=FILL_FILENAME,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -1,9 +1,18 @@
-from django.db import models
+import os
+import uuid
+from django.contrib.postgres.fields import JSONField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, IntegerField, Max, Q
+from django.db.models.functions import Cast, Substr
 from django.conf import settings
+from django.utils import timezone
 from django.utils.text import slugify
 from profiles.models import Company
 from info import models as info_m
 from gluru_backend.models import TimestampedModel, CreatedOnModel
+from tickets import constants
 
 
 class Document(models.Model):
@@ -13,6 +22,15 @@ class Document(models.Model):
         blank=True
     )
 
+    # Identical uploads share one document
+    sha256 = models.CharField(
+        max_length=64,
+        unique=True,
+        null=True,
+        blank=True,
+        editable=False
+    )
+
 
 class ActiveTicketManager(models.Manager):
 
@@ -122,6 +140,21 @@ class Ticket(TimestampedModel):
         default=0
     )
 
+    vote_no = models.IntegerField(
+        blank=True,
+        default=0
+    )
+
+    subscriber_no = models.IntegerField(
+        blank=True,
+        default=0
+    )
+
+    attachment_no = models.IntegerField(
+        blank=True,
+        default=0
+    )
+
     is_private = models.BooleanField(
         blank=True,
         default=False
@@ -146,6 +179,11 @@ class Ticket(TimestampedModel):
         through='Attachments'
     )
 
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False
+    )
+
     @property
     def owned_by(self):
         return self.created_for if self.created_for else self.created_by
@@ -156,19 +194,104 @@ class Ticket(TimestampedModel):
     def __str__(self):
         return '{} - {}'.format(self.id, self.title)
 
+    class Meta(TimestampedModel.Meta):
+        indexes = [
+            models.Index(
+                fields=['is_deleted', 'company_association', 'created_at'],
+                name='ticket_visibility_idx'
+            ),
+            models.Index(
+                fields=['is_deleted', 'status', 'updated_at'],
+                name='ticket_sla_idx'
+            ),
+            GinIndex(
+                fields=['search_vector'],
+                name='ticket_search_idx'
+            ),
+        ]
+
     def _get_unique_slug(self):
+        """
+        Slug of the title, numbered one past the highest number taken by
+        tickets with the same title, found in a single query
+        """
         slug = slugify(self.title)
-        unique_slug = slug
-        num = 1
-        while Ticket.objects.filter(slug=unique_slug).exists():
-            unique_slug = '{}-{}'.format(slug, num)
-            num += 1
-        return unique_slug
+        taken = Ticket.objects.filter(
+            Q(slug=slug) |
+            Q(
+                slug__startswith='{}-'.format(slug),
+                slug__regex=r'^{}-[0-9]{{1,9}}$'.format(slug)
+            )
+        ).aggregate(
+            base=Count('pk', filter=Q(slug=slug)),
+            last=Max(Cast(Substr('slug', len(slug) + 2), IntegerField()),
+                     filter=~Q(slug=slug))
+        )
+
+        if not taken['base']:
+            return slug
+        return '{}-{}'.format(slug, (taken['last'] or 0) + 1)
 
     def save(self, *args, **kwargs):
-        if not self.slug:
+        if self.slug:
+            return super().save(*args, **kwargs)
+
+        # Tickets with the same title created at once may pick the same
+        # slug; the ones losing the unique constraint take the next number
+        for attempt in range(constants.SLUG_ATTEMPTS):
             self.slug = self._get_unique_slug()
-        super().save(*args, **kwargs)
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                if attempt == constants.SLUG_ATTEMPTS - 1 or \
+                        not Ticket.objects.filter(slug=self.slug).exists():
+                    self.slug = ''
+                    raise
+
+    @classmethod
+    def update_counters(cls, pk, **deltas):
+        """
+        Apply counter deltas in a single UPDATE, e.g.
+        `Ticket.update_counters(pk, vote_no=1)`.
+        """
+        return cls.objects.filter(pk=pk).update(**{
+            field: F(field) + delta for field, delta in deltas.items()
+        })
+
+    def _add_member(self, through, counter, user):
+        _, created = through.objects.get_or_create(
+            ticket_id=self.pk,
+            user_id=user.pk
+        )
+        if created:
+            Ticket.update_counters(self.pk, **{counter: 1})
+        return created
+
+    def _remove_member(self, through, counter, user):
+        deleted, _ = through.objects.filter(
+            ticket_id=self.pk,
+            user_id=user.pk
+        ).delete()
+        if deleted:
+            Ticket.update_counters(self.pk, **{counter: -deleted})
+        return bool(deleted)
+
+    def add_voter(self, user):
+        return self._add_member(Ticket.voters.through, 'vote_no', user)
+
+    def remove_voter(self, user):
+        return self._remove_member(Ticket.voters.through, 'vote_no', user)
+
+    def add_subscriber(self, user):
+        return self._add_member(
+            Ticket.subscribers.through, 'subscriber_no', user
+        )
+
+    def remove_subscriber(self, user):
+        return self._remove_member(
+            Ticket.subscribers.through, 'subscriber_no', user
+        )
 
 
 class ActiveAnswerManager(models.Manager):
@@ -257,18 +380,9 @@ class TicketHistory(CreatedOnModel):
         on_delete=models.CASCADE
     )
 
-    changed_field = models.CharField(
-        max_length=100
-    )
-
-    before_value = models.TextField(
-        blank=True,
-        null=True
-    )
-
-    after_value = models.TextField(
-        blank=True,
-        null=True
+    # {field: [before, after]} of every field changed by one save
+    changes = JSONField(
+        default=dict
     )
 
     class Meta:
@@ -296,3 +410,71 @@ class Attachments(models.Model):
         related_name='answer_attachments',
         null=True
     )
+
+    # Name the file was uploaded with; the document may hold the content of
+    # other uploads too
+    filename = models.CharField(
+        max_length=255,
+        blank=True
+    )
+
+
+class PendingIndexUpdate(models.Model):
+    """
+    Ticket whose search document is stale. One row per ticket however many
+    times it changed, until the indexing worker picks it up.
+    """
+
+    ticket_id = models.IntegerField(
+        primary_key=True
+    )
+
+    queued_at = models.DateTimeField(
+        default=timezone.now
+    )
+
+
+class UploadSession(CreatedOnModel):
+    """
+    File uploaded in chunks, possibly over several requests. The bytes
+    received so far are kept under UPLOAD_SESSION_ROOT until the upload
+    is attached to a ticket or an answer.
+    """
+
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False
+    )
+
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name='upload_sessions',
+        on_delete=models.CASCADE
+    )
+
+    filename = models.CharField(
+        max_length=255
+    )
+
+    size = models.BigIntegerField()
+
+    offset = models.BigIntegerField(
+        default=0
+    )
+
+    # Set once the last chunk is written
+    sha256 = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        editable=False
+    )
+
+    @property
+    def path(self):
+        return os.path.join(settings.UPLOAD_SESSION_ROOT, str(self.pk))
+
+    @property
+    def is_complete(self):
+        return self.offset == self.size
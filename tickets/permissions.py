@@ -1,6 +1,5 @@
 from django.shortcuts import get_object_or_404
 from rest_framework import permissions
-from profiles.models import UserRole
 from tickets.models import Ticket
 
 
@@ -17,29 +16,25 @@ class TicketCustomPermission(permissions.BasePermission):
             if request.method in permissions.SAFE_METHODS else view.action
 
         if request.user.is_staff:
-            staff_role = UserRole.objects.get(name='staff')
-            return staff_role.has_permission(
+            return request.user.principal.has_staff_permission(
                 app_name='tickets',
                 model_name='Ticket',
                 action=action
             )
 
-        company = obj.company_association
-        if company is None:
+        if obj.company_association_id is None:
             return request.method in permissions.SAFE_METHODS or\
                 request.user == obj.created_by
 
         if not request.user.is_authenticated:
             return False
 
-        membership = company.membership_set.filter(user=request.user).first()
-
-        return membership and membership.role and\
-            membership.role.has_permission(
-                app_name='tickets',
-                model_name='Ticket',
-                action=action
-            )
+        return request.user.principal.has_permission(
+            obj.company_association_id,
+            app_name='tickets',
+            model_name='Ticket',
+            action=action
+        )
 
 
 class AnswerCustomPermission(permissions.BasePermission):
@@ -51,36 +46,29 @@ class AnswerCustomPermission(permissions.BasePermission):
         if request.user.is_superuser:
             return True
 
+        model_name = 'Ticket' if view.action == 'retrieve' else 'Answer'
+
         if request.user.is_staff:
-            staff_role = UserRole.objects.get(name='staff')
-            model_name = 'Ticket' if view.action == 'retrieve' else 'Answer'
-            return staff_role.has_permission(
+            return request.user.principal.has_staff_permission(
                 app_name='tickets',
                 model_name=model_name,
                 action=view.action
             )
-            membership = request.user.membership_set.filter(
-                company=obj.ticket.company_association
-            ).first()
 
-        if obj.ticket.company_association is None:
+        company_id = obj.ticket.company_association_id
+        if company_id is None:
             return request.method in permissions.SAFE_METHODS or\
                 request.user == obj.created_by
 
-        membership = None
-        if request.user.is_authenticated:
-            membership = request.user.membership_set.filter(
-                company=obj.ticket.company_association
-            ).first()
+        if not request.user.is_authenticated:
+            return False
 
-        model_name = 'Ticket' if view.action == 'retrieve' else 'Answer'
-
-        return membership and membership.role and\
-            membership.role.has_permission(
-                app_name='tickets',
-                model_name=model_name,
-                action=view.action
-            )
+        return request.user.principal.has_permission(
+            company_id,
+            app_name='tickets',
+            model_name=model_name,
+            action=view.action
+        )
 
 
 class TicketAccessPermission(permissions.BasePermission):
@@ -96,18 +84,48 @@ class TicketAccessPermission(permissions.BasePermission):
         if request.user.is_superuser:
             return True
 
+        if not request.user.is_authenticated:
+            return False
+
         if request.user.is_staff:
-            staff_role = UserRole.objects.get(name='staff')
-            return staff_role.has_permission(
+            return request.user.principal.has_staff_permission(
                 app_name='tickets',
                 model_name='Ticket',
                 action='retrieve'
             )
 
-        membership = company.membership_set.filter(user=request.user).first()
-        return membership and membership.role and\
-            membership.role.has_permission(
-                app_name='tickets',
-                model_name='Ticket',
-                action='retrieve'
-            )
+        return request.user.principal.has_permission(
+            company.id,
+            app_name='tickets',
+            model_name='Ticket',
+            action='retrieve'
+        )
+
+
+def has_ticket_permission(user, ticket, model_name, action):
+    """
+    Whether user may apply action to model_name on ticket, as the permission
+    classes decide for an unsafe request
+    """
+    if user.is_superuser:
+        return True
+
+    if user.is_staff:
+        return user.principal.has_staff_permission(
+            app_name='tickets',
+            model_name=model_name,
+            action=action
+        )
+
+    if ticket.company_association_id is None:
+        return user.pk is not None and user.pk == ticket.created_by_id
+
+    if not user.is_authenticated:
+        return False
+
+    return user.principal.has_permission(
+        ticket.company_association_id,
+        app_name='tickets',
+        model_name=model_name,
+        action=action
+    )
@@ -0,0 +1,127 @@
+import re
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchVector
+from django.db.models import (
+    CharField, Count, F, OuterRef, Subquery, TextField, Value
+)
+from django.db.models.functions import Cast, Coalesce
+from tickets import constants
+from tickets.models import Ticket, Answer
+
+
+class PrefixSearchQuery(SearchQuery):
+    """
+    tsquery matching documents that contain every word of the value, each
+    one as a prefix, like the autocomplete search of the haystack index
+    """
+
+    def __init__(self, value, **kwargs):
+        kwargs.setdefault('config', constants.SEARCH_CONFIG)
+        super().__init__(' & '.join(
+            '{}:*'.format(term) for term in re.findall(r'\w+', value)
+        ), **kwargs)
+
+    function = 'to_tsquery'
+
+    def as_sql(self, compiler, connection):
+        config_sql, config_params = compiler.compile(self.config)
+        template = '{}({}::regconfig, %s)'.format(self.function, config_sql)
+        if self.invert:
+            template = '!!({})'.format(template)
+        return template, config_params + [self.value]
+
+
+def ticket_search_vector():
+    """
+    Title weighted above body, above the text of the ticket's answers
+    """
+    answers = Subquery(
+        Answer.actives.filter(ticket=OuterRef('pk')).order_by().values(
+            'ticket'
+        ).annotate(
+            text=StringAgg('body', delimiter=' ')
+        ).values('text'),
+        output_field=TextField()
+    )
+
+    return SearchVector(
+        'title', weight='A', config=constants.SEARCH_CONFIG
+    ) + SearchVector(
+        'body', weight='B', config=constants.SEARCH_CONFIG
+    ) + SearchVector(
+        answers, weight='C', config=constants.SEARCH_CONFIG
+    )
+
+
+def refresh_search_vectors(ticket_ids):
+    """
+    Recompute the search vector of tickets, from their current title, body
+    and answers
+    """
+    Ticket.objects.filter(pk__in=ticket_ids).update(
+        search_vector=ticket_search_vector()
+    )
+
+
+# Ticket columns of the facets, with the defaults of the search index
+FACET_COLUMNS = {
+    'category': 'category_id',
+    'status': 'status_id',
+    'issue_type': 'issue_type_id',
+    'gluu_server': 'gluu_server',
+    'os': 'os',
+    'assignee': Coalesce('assignee_id', 0),
+    'company': Coalesce('company_association_id', 0),
+}
+
+TEXT_FACETS = ('gluu_server', 'os')
+
+
+def facet_expression(field):
+    column = FACET_COLUMNS[field]
+    if isinstance(column, str):
+        return F(column)
+    return column
+
+
+def narrow_facet(queryset, field, value):
+    """
+    Restrict queryset to one facet value, as selected_facets does on the
+    haystack index
+    """
+    alias = 'facet_{}'.format(field)
+    if field not in TEXT_FACETS:
+        try:
+            value = int(value)
+        except ValueError:
+            return queryset.none()
+
+    return queryset.annotate(
+        **{alias: facet_expression(field)}
+    ).filter(**{alias: value})
+
+
+def ticket_facet_counts(queryset):
+    """
+    Counts of every facet value over queryset in one UNION ALL query,
+    shaped like SearchQuerySet.facet_counts()
+    """
+    counts = None
+    for field in constants.TICKET_FACETS:
+        part = queryset.order_by().annotate(
+            facet=Value(field, output_field=CharField()),
+            value=Cast(facet_expression(field), CharField())
+        ).values('facet', 'value').annotate(count=Count('pk'))
+        counts = part if counts is None else counts.union(part, all=True)
+
+    fields = {field: [] for field in constants.TICKET_FACETS}
+    for row in counts:
+        value = row['value']
+        if value is not None and row['facet'] not in TEXT_FACETS:
+            value = int(value)
+        fields[row['facet']].append((value, row['count']))
+
+    for values in fields.values():
+        values.sort(key=lambda item: item[1], reverse=True)
+
+    return {'fields': fields, 'dates': {}, 'queries': {}}
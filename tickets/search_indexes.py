@@ -8,23 +8,28 @@ class TicketIndex(indexes.SearchIndex, indexes.Indexable):
     text = indexes.CharField(document=True, use_template=True)
 
     status = indexes.IntegerField(
-        model_attr='status__id'
+        model_attr='status__id',
+        faceted=True
     )
 
     category = indexes.IntegerField(
-        model_attr='category__id'
+        model_attr='category__id',
+        faceted=True
     )
 
     issue_type = indexes.IntegerField(
-        model_attr='issue_type__id'
+        model_attr='issue_type__id',
+        faceted=True
     )
 
-    gluu_server = indexes.IntegerField(
-        model_attr='gluu_server__id'
+    gluu_server = indexes.CharField(
+        model_attr='gluu_server',
+        faceted=True
     )
 
-    os = indexes.IntegerField(
-        model_attr='os__id'
+    os = indexes.CharField(
+        model_attr='os',
+        faceted=True
     )
 
     created_by = indexes.IntegerField(
@@ -34,12 +39,18 @@ class TicketIndex(indexes.SearchIndex, indexes.Indexable):
 
     assignee = indexes.IntegerField(
         model_attr='assignee__id',
-        default=0
+        default=0,
+        faceted=True
     )
 
     company = indexes.IntegerField(
         model_attr='company_association__id',
-        default=0
+        default=0,
+        faceted=True
+    )
+
+    is_private = indexes.BooleanField(
+        model_attr='is_private'
     )
 
     autocomplete = indexes.EdgeNgramField()
@@ -52,4 +63,8 @@ class TicketIndex(indexes.SearchIndex, indexes.Indexable):
         return Ticket
 
     def index_queryset(self, using=None):
-        return self.get_model().actives.all()
+        # Every relation the fields and the text template read
+        return self.get_model().actives.select_related(
+            'status', 'category', 'issue_type', 'created_by', 'assignee',
+            'company_association'
+        ).prefetch_related('answers')
@@ -1,12 +1,16 @@
+import os
 from django.shortcuts import get_object_or_404
 from rest_framework import serializers
 from rest_framework.exceptions import PermissionDenied
 from drf_haystack.serializers import HaystackSerializer
+from drf_haystack.serializers import HaystackFacetSerializer
 from drf_haystack.serializers import HighlighterMixin
 from tickets.search_indexes import TicketIndex
+from tickets import constants
 from tickets import models as m
+from info.catalog import get_product
 from info.models import GluuProduct, TicketStatus
-from profiles.models import UserRole, User
+from profiles.models import User
 from profiles.serializers import ShortUserSerializer, ShortCompanySerializer
 
 
@@ -27,7 +31,60 @@ class TicketSearchSerializer(HighlighterMixin, HaystackSerializer):
         }
 
 
+class TicketFacetSerializer(HaystackFacetSerializer):
+    serialize_objects = True
+
+    class Meta:
+        index_classes = [TicketIndex]
+
+        fields = constants.TICKET_FACETS
+        field_options = {field: {} for field in constants.TICKET_FACETS}
+
+
+class TicketFullTextSearchSerializer(serializers.ModelSerializer):
+    """
+    Same shape as TicketSearchSerializer, for the PostgreSQL search
+    """
+    text = serializers.SerializerMethodField()
+    company = serializers.IntegerField(source='company_association_id')
+    highlighted = serializers.CharField(read_only=True)
+
+    class Meta:
+        model = m.Ticket
+        fields = [
+            "text", "category", "status", "issue_type", "gluu_server", "os",
+            "created_by", "assignee", "company", "highlighted"
+        ]
+
+    def get_text(self, obj):
+        return "\n".join((obj.title, obj.body))
+
+    def to_representation(self, instance):
+        ret = super().to_representation(instance)
+        if not ret["highlighted"]:
+            del ret["highlighted"]
+        return ret
+
+
+class CatalogProductField(serializers.PrimaryKeyRelatedField):
+    """
+    Product by id, looked up in the product catalog instead of the database
+    """
+
+    def to_internal_value(self, data):
+        try:
+            product = get_product(pk=int(data))
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+        if product is None:
+            self.fail('does_not_exist', pk_value=data)
+
+        return product.instance
+
+
 class TicketProductSerializer(serializers.ModelSerializer):
+    product = CatalogProductField(queryset=GluuProduct.objects.all())
 
     class Meta:
         model = m.TicketProduct
@@ -36,11 +93,11 @@ class TicketProductSerializer(serializers.ModelSerializer):
         )
 
     def validate(self, data):
-        product = data.get('product', None)
+        product = get_product(pk=data['product'].pk)
         version = data.get('version', None)
         os = data.get('os', None)
 
-        if version not in product.version:
+        if version not in product.versions:
             raise serializers.ValidationError('Invalid Product Version Value')
 
         if os not in product.os:
@@ -68,9 +125,12 @@ class TicketSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'slug', 'title', 'body', 'created_by', 'created_for',
             'updated_by', 'assignee', 'category', 'status', 'issue_type',
-            'gluu_server', 'os', 'os_version', 'response_no', 'products',
-            'voters', 'subscribers', 'company_association', 'created_at',
-            'updated_at'
+            'gluu_server', 'os', 'os_version', 'response_no', 'vote_no',
+            'subscriber_no', 'attachment_no', 'products', 'voters',
+            'subscribers', 'company_association', 'created_at', 'updated_at'
+        ]
+        read_only_fields = [
+            'response_no', 'vote_no', 'subscriber_no', 'attachment_no'
         ]
         extra_kwargs = {
             'slug': {'required': False},
@@ -81,14 +141,14 @@ class TicketSerializer(serializers.ModelSerializer):
         }
 
     def validate_gluu_server(self, value):
-        server = GluuProduct.objects.get(name='Gluu Server')
-        if value not in server.version:
+        server = get_product(name='Gluu Server')
+        if server is None or value not in server.versions:
             raise serializers.ValidationError('Invalid Gluu Server Value')
         return value
 
     def validate_os(self, value):
-        server = GluuProduct.objects.get(name='Gluu Server')
-        if value not in server.os:
+        server = get_product(name='Gluu Server')
+        if server is None or value not in server.os:
             raise serializers.ValidationError('Invalid OS Value')
         return value
 
@@ -104,9 +164,9 @@ class TicketSerializer(serializers.ModelSerializer):
 
         if company_id:
             company_association = get_object_or_404(m.Company, pk=company_id)
+            principal = created_by.principal
             if not created_by.is_superuser and created_by.is_staff:
-                staff_role = UserRole.objects.get(name='staff')
-                if not staff_role.has_permission(
+                if not principal.has_staff_permission(
                     app_name='tickets',
                     model_name='Ticket',
                     action='create'
@@ -116,16 +176,13 @@ class TicketSerializer(serializers.ModelSerializer):
                     )
 
             if not created_by.is_staff:
-                membership = created_by.membership_set.filter(
-                    company=company_association
-                ).first()
-
-                if membership is None or membership.role is None:
+                if principal.role_id(company_association.id) is None:
                     raise PermissionDenied(
                         'You do not have permission to perform this action.'
                     )
 
-                if not membership.role.has_permission(
+                if not principal.has_permission(
+                    company_association.id,
                     app_name='tickets',
                     model_name='Ticket',
                     action='create'
@@ -178,11 +235,86 @@ class TicketSerializer(serializers.ModelSerializer):
         return instance
 
 
+class TicketBulkChangesSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = m.Ticket
+        fields = constants.BULK_FIELDS
+        extra_kwargs = {
+            field: {'required': False} for field in constants.BULK_FIELDS
+        }
+
+
+class TicketBulkFilterSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = m.Ticket
+        fields = constants.BULK_FILTERS
+        extra_kwargs = {
+            field: {'required': False} for field in constants.BULK_FILTERS
+        }
+
+
+class TicketBulkSerializer(serializers.Serializer):
+    """
+    Changes to apply to the tickets given by slug or matching a filter
+    """
+    tickets = serializers.ListField(
+        child=serializers.SlugField(),
+        required=False,
+        min_length=1,
+        max_length=constants.BULK_MAX_TICKETS
+    )
+    filter = TicketBulkFilterSerializer(required=False)
+    changes = TicketBulkChangesSerializer()
+
+    def validate(self, data):
+        if ('tickets' in data) == ('filter' in data):
+            raise serializers.ValidationError(
+                'Select tickets either by slug or by filter'
+            )
+
+        if 'filter' in data and not data['filter']:
+            raise serializers.ValidationError('No filter given')
+
+        if not data['changes']:
+            raise serializers.ValidationError('No changes given')
+
+        return data
+
+
 class TicketHistorySerializer(serializers.ModelSerializer):
+    """
+    One entry per changed field of a history record, with stringified
+    before and after values
+    """
 
     class Meta:
         model = m.TicketHistory
-        fields = '__all__'
+        fields = ['id', 'created_at', 'ticket', 'changed_by']
+
+    def to_representation(self, instance):
+        ret = super().to_representation(instance)
+        return [
+            dict(
+                ret,
+                changed_field=field,
+                before_value=None if before is None else str(before),
+                after_value=None if after is None else str(after)
+            )
+            for field, (before, after) in sorted(instance.changes.items())
+        ]
+
+
+class TicketHistoryListSerializer(serializers.ListSerializer):
+    child = TicketHistorySerializer()
+
+    def to_representation(self, data):
+        return [
+            change
+            for changes in super().to_representation(data)
+            for change in changes
+        ]
 
 
 class AnswerSerializer(serializers.ModelSerializer):
@@ -204,9 +336,10 @@ class AnswerSerializer(serializers.ModelSerializer):
         ticket = self.context.get('ticket', None)
         created_by = self.context.get('created_by', None)
 
+        principal = created_by.principal
+
         if not created_by.is_superuser and created_by.is_staff:
-            staff_role = UserRole.objects.get(name='staff')
-            if not staff_role.has_permission(
+            if not principal.has_staff_permission(
                 app_name='tickets',
                 model_name='Answer',
                 action='create'
@@ -215,22 +348,19 @@ class AnswerSerializer(serializers.ModelSerializer):
                     'You do not have permission to perform this action.'
                 )
         if not created_by.is_staff:
-            if ticket.company_association is None:
+            if ticket.company_association_id is None:
                 if created_by != ticket.created_by:
                     raise PermissionDenied(
                         'You do not have permission to perform this action.'
                     )
             else:
-                membership = created_by.membership_set.filter(
-                    company=ticket.company_association
-                ).first()
-
-                if membership is None or membership.role is None:
+                if principal.role_id(ticket.company_association_id) is None:
                     raise PermissionDenied(
                         'You do not have permission to perform this action.'
                     )
 
-                if not membership.role.has_permission(
+                if not principal.has_permission(
+                    ticket.company_association_id,
                     app_name='tickets',
                     model_name='Answer',
                     action='create'
@@ -260,3 +390,64 @@ class DocumentSerializer(serializers.ModelSerializer):
     class Meta:
         model = m.Document
         fields = '__all__'
+
+
+class AttachmentSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = m.Attachments
+        fields = ['id', 'ticket', 'answer', 'filename']
+
+
+class AnswerThreadSerializer(AnswerSerializer):
+    """
+    Answer of a ticket thread, with its attachments
+    """
+    attachments = AttachmentSerializer(
+        source='answer_attachments', many=True, read_only=True
+    )
+
+    class Meta(AnswerSerializer.Meta):
+        fields = AnswerSerializer.Meta.fields + ['attachments']
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = m.UploadSession
+        fields = ['id', 'filename', 'size', 'offset']
+        read_only_fields = ['offset']
+
+    def validate_filename(self, value):
+        value = os.path.basename(value)
+        if not value:
+            raise serializers.ValidationError('Invalid file name')
+        return value
+
+    def validate_size(self, value):
+        if not 0 < value <= constants.UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                'Files must be between 1 byte and {} bytes'.format(
+                    constants.UPLOAD_MAX_SIZE
+                )
+            )
+        return value
+
+
+class AttachUploadsSerializer(serializers.Serializer):
+    uploads = serializers.ListField(
+        child=serializers.UUIDField(),
+        allow_empty=False
+    )
+
+    def validate_uploads(self, value):
+        uploads = list(m.UploadSession.objects.filter(
+            created_by=self.context['user'],
+            pk__in=value
+        ))
+        if len(uploads) != len(set(value)) or \
+                not all(upload.is_complete for upload in uploads):
+            raise serializers.ValidationError(
+                'Uploads must exist and be complete'
+            )
+        return uploads
@@ -0,0 +1,33 @@
+from django.db import transaction
+from django.db.models import signals
+from haystack.signals import BaseSignalProcessor
+from tickets.models import Ticket, Answer
+from tickets.tasks import queue_ticket_index
+
+
+class QueuedSignalProcessor(BaseSignalProcessor):
+    """
+    Queue ticket and answer changes for the indexing worker instead of
+    writing to the search index inside the request.
+    """
+
+    def setup(self):
+        signals.post_save.connect(self.handle_ticket, sender=Ticket)
+        signals.post_delete.connect(self.handle_ticket, sender=Ticket)
+        signals.post_save.connect(self.handle_answer, sender=Answer)
+        signals.post_delete.connect(self.handle_answer, sender=Answer)
+
+    def teardown(self):
+        signals.post_save.disconnect(self.handle_ticket, sender=Ticket)
+        signals.post_delete.disconnect(self.handle_ticket, sender=Ticket)
+        signals.post_save.disconnect(self.handle_answer, sender=Answer)
+        signals.post_delete.disconnect(self.handle_answer, sender=Answer)
+
+    def enqueue(self, ticket_id):
+        transaction.on_commit(lambda: queue_ticket_index(ticket_id))
+
+    def handle_ticket(self, sender, instance, **kwargs):
+        self.enqueue(instance.pk)
+
+    def handle_answer(self, sender, instance, **kwargs):
+        self.enqueue(instance.ticket_id)
@@ -1,29 +1,63 @@
-import re
+from functools import partial
+from django.conf import settings
+from django.db import transaction
 from django.dispatch import receiver
-from django.db.models.signals import post_save
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.utils import timezone
 from fieldsignals import pre_save_changed
 from tickets.models import Ticket, Answer
-from notification.notifications import (
-    notify_new_ticket, notify_ticket_assigned, notify_ticket_reopened,
-    notify_new_answer, notify_tagged_staff_member
-)
-from profiles.models import User
+from tickets.autocomplete import title_index
+from tickets.audit import record_changes
+from tickets.search import refresh_search_vectors
+from tickets import constants as ticket_constants
+from notification import constants
+from notification.events import record_event
+
+
+def refresh_search_vector(ticket_id):
+    """
+    Keep the search vector in step with the row saved, so tickets are
+    found as soon as the transaction commits rather than once the indexing
+    worker runs
+    """
+    if settings.TICKET_SEARCH_BACKEND == ticket_constants.POSTGRES_SEARCH:
+        refresh_search_vectors([ticket_id])
 
 
 @receiver(post_save, sender=Ticket)
 def ticket_saved(sender, instance, created, **kwargs):
+    transaction.on_commit(partial(title_index.update_ticket, instance))
+    refresh_search_vector(instance.pk)
+
+    record_changes(
+        instance.pk,
+        instance.updated_by_id or instance.created_by_id,
+        vars(instance).pop('_history_changes', None)
+    )
+
+    # events of the changed fields, recorded once the row is written
+    for event_type, actor in vars(instance).pop('_pending_events', []):
+        record_event(event_type, actor=actor, ticket_id=instance.pk)
+
     if not created:
         return
 
-    notify_new_ticket(instance)
+    record_event(
+        constants.TICKET_CREATED,
+        actor=instance.created_by,
+        ticket_id=instance.pk
+    )
+
+
+@receiver(post_delete, sender=Ticket)
+def ticket_deleted(sender, instance, **kwargs):
+    transaction.on_commit(partial(title_index.remove, instance.pk))
 
 
 @receiver(
     pre_save_changed, sender=Ticket,
-    fields=[
-        'assignee', 'status', 'is_deleted', 'issue_type',
-        'title', 'body', 'created_for'
-    ]
+    fields=ticket_constants.HISTORY_FIELDS
 )
 def ticket_fields_monitor(sender, instance, changed_fields=None, **kwargs):
     context = {}
@@ -31,64 +65,73 @@ def ticket_fields_monitor(sender, instance, changed_fields=None, **kwargs):
         instance.updated_by if instance.updated_by else instance.created_by
     )
 
+    # recorded by ticket_saved once the row is actually written
+    changes = vars(instance).setdefault('_history_changes', {})
+    events = vars(instance).setdefault('_pending_events', [])
+
     for field, (old, new) in changed_fields.items():
         context[field.name] = (old, new)
-        instance.history.create(
-            changed_by=updated_by,
-            changed_field=field.name,
-            before_value=old,
-            after_value=new
-        )
+        changes[field.name] = [old, new]
 
     if 'assignee' in context:
-        notify_ticket_assigned(instance, updated_by)
+        events.append((constants.TICKET_ASSIGNED, updated_by))
 
     if 'status' in context and context['status'][0] == 'close':
-        notify_ticket_reopened(instance, updated_by)
+        events.append((constants.TICKET_REOPENED, updated_by))
 
 
 @receiver(post_save, sender=Answer)
 def answer_saved(sender, instance, created, **kwargs):
+    if created:
+        delta = 0 if instance.is_deleted else 1
+    else:
+        delta = vars(instance).pop('_response_no_delta', 0)
+
+    if delta:
+        Ticket.objects.filter(pk=instance.ticket_id).update(
+            response_no=F('response_no') + delta,
+            updated_at=timezone.now()
+        )
 
-    instance.ticket.response_no += 1
-    instance.ticket.save()
+    refresh_search_vector(instance.ticket_id)
 
-    if not created:
-        return
+    changes = vars(instance).pop('_history_changes', {})
+    if created:
+        changes['answer'] = [None, instance.body[:30]]
 
-    # Create Ticket History
-    instance.ticket.history.create(
-        changed_by=instance.created_by,
-        changed_field='answer',
-        after_value=instance.body[:30]
+    record_changes(
+        instance.ticket_id,
+        instance.updated_by_id or instance.created_by_id,
+        changes
     )
 
-    notify_new_answer(instance)
-
-    to_emails = []
-    tagged_users = re.findall(r'@[\w\.-]+', instance.body)
-    for tagged_user in tagged_users:
-        name = tagged_user.replace('@', '').split('.')
-        emails = User.objects.filter(
-            first_name__icontains=name[0],
-            last_name__icontains=name[1]
-        ).values_list('email', flat=True)
-
-        to_emails += list(emails)
+    if not created:
+        return
 
-    notify_tagged_staff_member(instance, to_emails)
+    record_event(
+        constants.ANSWER_CREATED,
+        actor=instance.created_by,
+        answer_id=instance.pk
+    )
 
 
 @receiver(pre_save_changed, sender=Answer, fields=['is_deleted', 'body'])
 def answer_fields_monitor(sender, instance, changed_fields=None, **kwargs):
-    updated_by = (
-        instance.updated_by if instance.updated_by else instance.created_by
-    )
+    # applied by answer_saved once the row is actually written
+    changes = vars(instance).setdefault('_history_changes', {})
 
     for field, (old, new) in changed_fields.items():
-        instance.ticket.history.create(
-            changed_by=updated_by,
-            changed_field='answer' if field.name == 'body' else field.name,
-            before_value=old if field.name == 'is_deleted' else old[:30],
-            after_value=new if field.name == 'is_deleted' else new[:30],
-        )
+        if field.name == 'is_deleted':
+            if instance.pk:
+                instance._response_no_delta = -1 if new else 1
+            changes['is_deleted'] = [old, new]
+        else:
+            changes['answer'] = [old and old[:30], new and new[:30]]
+
+
+@receiver(post_delete, sender=Answer)
+def answer_deleted(sender, instance, **kwargs):
+    if not instance.is_deleted:
+        Ticket.update_counters(instance.ticket_id, response_no=-1)
+
+    refresh_search_vector(instance.ticket_id)
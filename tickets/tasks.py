@@ -0,0 +1,144 @@
+import os
+from datetime import timedelta
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from haystack import connections
+from haystack.exceptions import NotHandled
+from haystack.utils import get_identifier
+from gluru_backend.celery import app
+from tickets import constants
+from tickets.models import Ticket, PendingIndexUpdate, UploadSession
+from tickets.search import refresh_search_vectors
+
+
+def queue_ticket_index(ticket_id):
+    """
+    Mark a ticket's search document as stale. Repeated changes to the same
+    ticket coalesce into one pending row and one scheduled index run.
+    """
+    PendingIndexUpdate.objects.update_or_create(
+        ticket_id=ticket_id,
+        defaults={'queued_at': timezone.now()}
+    )
+
+    schedule_index_update()
+
+
+def queue_tickets_index(ticket_ids):
+    """
+    queue_ticket_index for several tickets, in a few queries however many
+    there are
+    """
+    queued_at = timezone.now()
+    pending = set(
+        PendingIndexUpdate.objects.filter(
+            ticket_id__in=ticket_ids
+        ).values_list('ticket_id', flat=True)
+    )
+    PendingIndexUpdate.objects.filter(
+        ticket_id__in=pending
+    ).update(queued_at=queued_at)
+
+    created = [
+        PendingIndexUpdate(ticket_id=ticket_id, queued_at=queued_at)
+        for ticket_id in ticket_ids if ticket_id not in pending
+    ]
+    try:
+        with transaction.atomic():
+            PendingIndexUpdate.objects.bulk_create(created)
+    except IntegrityError:
+        # Some were queued concurrently
+        for update in created:
+            PendingIndexUpdate.objects.update_or_create(
+                ticket_id=update.ticket_id,
+                defaults={'queued_at': queued_at}
+            )
+
+    schedule_index_update()
+
+
+def schedule_index_update():
+    """
+    Schedule an index run unless one is already. The flag expires, so
+    changes made after a run was lost schedule another one; pending rows
+    nothing schedules are swept up by the beat.
+    """
+    if not cache.add(
+            constants.SEARCH_INDEX_SCHEDULED_KEY, True,
+            constants.SEARCH_INDEX_SCHEDULED_TIMEOUT):
+        return
+
+    update_search_index.apply_async(
+        countdown=constants.SEARCH_INDEX_DELAY,
+        queue=constants.SEARCH_INDEX_QUEUE,
+        routing_key=constants.SEARCH_INDEX_QUEUE
+    )
+
+
+@app.task
+def update_search_index():
+    """
+    Apply pending ticket changes to the search index in one batch.
+
+    Meant to run on a single worker consuming the search queue, so there
+    is only ever one index writer.
+    """
+    # Changes queued from now on need another run
+    cache.delete(constants.SEARCH_INDEX_SCHEDULED_KEY)
+
+    pending = list(
+        PendingIndexUpdate.objects.order_by('queued_at').values_list(
+            'ticket_id', 'queued_at'
+        )[:constants.SEARCH_INDEX_BATCH_SIZE]
+    )
+    if not pending:
+        return
+
+    ticket_ids = [ticket_id for ticket_id, _ in pending]
+    refresh_search_vectors(ticket_ids)
+
+    for using in connections.connections_info:
+        try:
+            index = connections[using].get_unified_index().get_index(Ticket)
+        except NotHandled:
+            continue
+
+        backend = connections[using].get_backend()
+        tickets = list(
+            index.index_queryset(using=using).filter(pk__in=ticket_ids)
+        )
+        if tickets:
+            backend.update(index, tickets)
+
+        # Deleted tickets, soft or hard, drop out of index_queryset
+        indexed = {ticket.pk for ticket in tickets}
+        for ticket_id in ticket_ids:
+            if ticket_id not in indexed:
+                backend.remove(get_identifier(Ticket(pk=ticket_id)))
+
+    # Entries queued again while indexing stay for the next run
+    processed = Q()
+    for ticket_id, queued_at in pending:
+        processed |= Q(ticket_id=ticket_id, queued_at=queued_at)
+    PendingIndexUpdate.objects.filter(processed).delete()
+
+    if PendingIndexUpdate.objects.exists():
+        schedule_index_update()
+
+
+@app.task
+def remove_stale_uploads():
+    """
+    Drop the uploads left unfinished or unattached for UPLOAD_SESSION_TTL
+    """
+    stale = UploadSession.objects.filter(
+        created_at__lt=timezone.now() - timedelta(
+            seconds=constants.UPLOAD_SESSION_TTL
+        )
+    )
+    for upload in stale:
+        if os.path.exists(upload.path):
+            os.remove(upload.path)
+        upload.delete()
@@ -1,11 +1,66 @@
+import hashlib
 import json
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import DatabaseError, connection, transaction
 from django.urls import reverse
 from django.core.management import call_command
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
-from rest_framework.test import APITestCase
-from info.models import UserRole
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIRequestFactory, APITestCase
+from gluru_backend.testing import capture_on_commit_callbacks
+from gluru_backend.utils import get_eager_relations
+from haystack import connections
+from haystack.query import SearchQuerySet
+from info.models import Permission, UserRole
 from profiles.models import User, Company, Membership
-from tickets.models import Ticket, Answer
+from profiles.serializers import UserAssociationSerializer
+from tickets.models import (
+    Ticket, TicketHistory, Answer, Attachments, Document, UploadSession,
+    PendingIndexUpdate
+)
+from tickets import constants
+from tickets.audit import HistoryBatch, get_open_batches
+from tickets.autocomplete import title_index
+from tickets.search import (
+    PrefixSearchQuery, narrow_facet, ticket_facet_counts
+)
+from tickets.tasks import update_search_index
+from tickets.management.commands.rebuild_ticket_index import (
+    Command as RebuildCommand
+)
+from tickets.uploads import attach_uploads
+from tickets.views import TicketFullTextSearchView
+
+
+@contextmanager
+def search_index():
+    """
+    The default search connection, on an empty index of its own
+    """
+    index_root = tempfile.mkdtemp()
+    try:
+        with mock.patch.dict(
+                connections.connections_info['default'],
+                {'PATH': index_root}):
+            connections.reload('default')
+            try:
+                yield
+            finally:
+                connections.reload('default')
+    finally:
+        shutil.rmtree(index_root)
 
 
 class TicketViewSetTest(APITestCase):
@@ -212,6 +267,611 @@ class TicketViewSetTest(APITestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_autocomplete_tickets(self):
+        """
+         - autocomplete tickets by unauthenticated user
+         - autocomplete tickets by company user
+         - autocomplete renamed and deleted tickets
+         - keep the title of a rolled back rename
+         - pick up a rename committed late by another process
+        """
+        title_index.build()
+        with capture_on_commit_callbacks(execute=True):
+            self.ticket_by_gluu_admin.title = 'Oxauth crashes on startup'
+            self.ticket_by_gluu_admin.save()
+            self.ticket_by_community_user.title = 'Oxauth login page'
+            self.ticket_by_community_user.save()
+
+        # autocomplete tickets by unauthenticated user
+        response = self.client.get(
+            reverse('tickets:ticket-autocomplete'), {'q': 'oxa'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [ticket['id'] for ticket in response.data['results']],
+            [self.ticket_by_community_user.id]
+        )
+
+        # autocomplete tickets by company user
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Token ' + self.gluu_admin.token
+        )
+        response = self.client.get(
+            reverse('tickets:ticket-autocomplete'), {'q': 'oxauth cra'}
+        )
+        self.assertEqual(
+            [ticket['id'] for ticket in response.data['results']],
+            [self.ticket_by_gluu_admin.id]
+        )
+
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Token ' + self.openiam_admin.token
+        )
+        response = self.client.get(
+            reverse('tickets:ticket-autocomplete'), {'q': 'oxauth cra'}
+        )
+        self.assertEqual(response.data['results'], [])
+
+        # autocomplete renamed and deleted tickets
+        with capture_on_commit_callbacks(execute=True):
+            self.ticket_by_community_user.title = 'Login page'
+            self.ticket_by_community_user.save()
+            self.ticket_by_gluu_admin.is_deleted = True
+            self.ticket_by_gluu_admin.save()
+        response = self.client.get(
+            reverse('tickets:ticket-autocomplete'), {'q': 'oxa'}
+        )
+        self.assertEqual(response.data['results'], [])
+
+        # keep the title of a rolled back rename
+        with capture_on_commit_callbacks(execute=True):
+            with self.assertRaises(DatabaseError):
+                with transaction.atomic():
+                    self.ticket_by_community_user.title = 'Phantom page'
+                    self.ticket_by_community_user.save()
+                    raise DatabaseError
+        self.assertEqual(title_index.search('phantom'), [])
+        self.assertEqual(len(title_index.search('login')), 1)
+
+        # pick up a rename committed late by another process
+        Ticket.objects.filter(pk=self.ticket_by_community_user.pk).update(
+            title='Late page',
+            updated_at=title_index.last_updated_at - timedelta(seconds=30)
+        )
+        title_index.synced_at = 0
+        self.assertEqual(
+            [ticket['id'] for ticket in title_index.search('late')],
+            [self.ticket_by_community_user.id]
+        )
+
+    def test_queue_search_index(self):
+        """
+         - queue a changed ticket and schedule an index run
+         - schedule one run for further changes
+         - schedule again once the scheduled run was lost
+         - apply the queued changes to the index
+        """
+        cache.delete(constants.SEARCH_INDEX_SCHEDULED_KEY)
+        ticket = self.ticket_by_community_user
+
+        with mock.patch.object(update_search_index, 'apply_async') as run:
+            # queue a changed ticket and schedule an index run
+            with capture_on_commit_callbacks(execute=True):
+                ticket.title = 'Oxauth crashes on startup'
+                ticket.save()
+            self.assertTrue(
+                PendingIndexUpdate.objects.filter(ticket_id=ticket.pk)
+            )
+            self.assertEqual(run.call_count, 1)
+
+            # schedule one run for further changes
+            with capture_on_commit_callbacks(execute=True):
+                ticket.save()
+                Answer.objects.create(
+                    ticket=ticket, body='body', created_by=self.staff
+                )
+            self.assertEqual(PendingIndexUpdate.objects.count(), 1)
+            self.assertEqual(run.call_count, 1)
+
+            # schedule again once the scheduled run was lost
+            cache.delete(constants.SEARCH_INDEX_SCHEDULED_KEY)
+            with capture_on_commit_callbacks(execute=True):
+                ticket.save()
+            self.assertEqual(run.call_count, 2)
+
+        # apply the queued changes to the index
+        with search_index():
+            update_search_index()
+            self.assertFalse(PendingIndexUpdate.objects.exists())
+            self.assertEqual(
+                [
+                    int(result.pk) for result in
+                    SearchQuerySet().models(Ticket).filter(content='oxauth')
+                ],
+                [ticket.pk]
+            )
+
+    def test_search_ticket_visibility(self):
+        """
+         - search tickets by unauthenticated user
+         - search tickets by company user
+         - search tickets by staff
+         - search tickets by staff without list permission
+        """
+        Ticket.objects.create(
+            title='title', body='body', status_id=1, category_id=1,
+            issue_type_id=1, gluu_server='3.1.4', os='Ubuntu',
+            created_by=self.community_user, is_private=True
+        )
+        Ticket.objects.create(
+            title='title', body='body', status_id=1, category_id=1,
+            issue_type_id=1, gluu_server='3.1.4', os='Ubuntu',
+            created_by=self.openiam_admin, company_association=self.openiam
+        )
+        for ticket in Ticket.objects.all():
+            Ticket.objects.filter(pk=ticket.pk).update(
+                title='Crash {}'.format(ticket.pk)
+            )
+
+        with search_index():
+            call_command('rebuild_index', interactive=False, verbosity=0)
+
+            def search(user=None):
+                if user is None:
+                    self.client.credentials()
+                else:
+                    self.client.credentials(
+                        HTTP_AUTHORIZATION='Token ' + user.token
+                    )
+                response = self.client.get(
+                    reverse('tickets:location-search-list'), {'q': 'crash'}
+                )
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                return sorted(
+                    int(result['text'].split()[1])
+                    for result in response.data['results']
+                )
+
+            def visible(**filters):
+                return sorted(
+                    Ticket.objects.filter(**filters).values_list(
+                        'id', flat=True
+                    )
+                )
+
+            # search tickets by unauthenticated user
+            self.assertEqual(
+                search(),
+                visible(company_association=None, is_private=False)
+            )
+
+            # search tickets by company user
+            self.assertEqual(
+                search(self.gluu_user),
+                sorted(
+                    visible(company_association=None) +
+                    visible(company_association=self.gluu)
+                )
+            )
+
+            # search tickets by staff
+            self.assertEqual(search(self.staff), visible())
+
+            # search tickets by staff without list permission
+            UserRole.objects.get(name='staff').permissions.remove(
+                Permission.objects.get(
+                    model_name='Ticket', actions__contains=['list']
+                )
+            )
+            self.assertEqual(
+                search(self.staff), visible(company_association=None)
+            )
+
+    def test_ticket_facet_counts(self):
+        """
+         - count facets of every active ticket
+         - count facets of narrowed tickets
+        """
+        self.ticket_by_staff_for_gluu.os = 'CentOS'
+        self.ticket_by_staff_for_gluu.save()
+
+        # count facets of every active ticket
+        counts = ticket_facet_counts(Ticket.actives.all())
+        self.assertEqual(
+            counts['fields']['os'], [('Ubuntu', 2), ('CentOS', 1)]
+        )
+        self.assertEqual(
+            counts['fields']['company'], [(self.gluu.id, 2), (0, 1)]
+        )
+
+        # count facets of narrowed tickets
+        counts = ticket_facet_counts(
+            narrow_facet(Ticket.actives.all(), 'company', '0')
+        )
+        self.assertEqual(counts['fields']['os'], [('Ubuntu', 1)])
+        self.assertEqual(counts['fields']['gluu_server'], [('3.1.4', 1)])
+
+    @override_settings(TICKET_SEARCH_BACKEND=constants.POSTGRES_SEARCH)
+    def test_full_text_search(self):
+        """
+         - find a ticket as soon as it is saved
+         - find a ticket by the text of its answers
+         - match every word of the query as a prefix
+         - rank title matches above body matches
+         - hide private tickets from unauthenticated user
+        """
+        view = TicketFullTextSearchView.as_view({'get': 'list'})
+
+        def search(q, user=None):
+            headers = {}
+            if user is not None:
+                headers['HTTP_AUTHORIZATION'] = 'Token ' + user.token
+            response = view(
+                APIRequestFactory().get('/search/', {'q': q}, **headers)
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return [result['text'] for result in response.data['results']]
+
+        # find a ticket as soon as it is saved
+        ticket = Ticket.objects.create(
+            title='Database crash', body='The server stops', status_id=1,
+            category_id=1, issue_type_id=1, gluu_server='3.1.4',
+            os='Ubuntu', created_by=self.community_user
+        )
+        self.assertEqual(
+            search('crash'), ['Database crash\nThe server stops']
+        )
+
+        # find a ticket by the text of its answers
+        Answer.objects.create(
+            ticket=ticket, body='Restart nginx', created_by=self.staff
+        )
+        self.assertEqual(
+            search('nginx'), ['Database crash\nThe server stops']
+        )
+
+        # match every word of the query as a prefix
+        self.assertEqual(
+            search('datab serv'), ['Database crash\nThe server stops']
+        )
+        self.assertEqual(search('datab apache'), [])
+        self.assertTrue(
+            Ticket.objects.filter(
+                search_vector=PrefixSearchQuery('crash & datab')
+            ).exists()
+        )
+
+        # rank title matches above body matches
+        Ticket.objects.create(
+            title='Login fails', body='After the database crash',
+            status_id=1, category_id=1, issue_type_id=1,
+            gluu_server='3.1.4', os='Ubuntu', created_by=self.community_user
+        )
+        self.assertEqual(
+            search('crash'), [
+                'Database crash\nThe server stops',
+                'Login fails\nAfter the database crash'
+            ]
+        )
+
+        # hide private tickets from unauthenticated user
+        ticket.is_private = True
+        ticket.save()
+        self.assertEqual(
+            search('crash'), ['Login fails\nAfter the database crash']
+        )
+        self.assertEqual(len(search('crash', self.manager)), 2)
+
+    def test_unique_ticket_slug(self):
+        """
+         - number the slugs of tickets with the same title
+         - take the next number after a slug conflict
+        """
+        # number the slugs of tickets with the same title
+        self.assertEqual(
+            [
+                self.ticket_by_community_user.slug,
+                self.ticket_by_gluu_admin.slug,
+                self.ticket_by_staff_for_gluu.slug
+            ],
+            ['title', 'title-1', 'title-2']
+        )
+
+        # take the next number after a slug conflict
+        get_unique_slug = Ticket._get_unique_slug
+        slugs = iter(['title-1'])
+        with mock.patch.object(
+            Ticket, '_get_unique_slug',
+            lambda ticket: next(slugs, None) or get_unique_slug(ticket)
+        ):
+            ticket = Ticket.objects.create(
+                title='title', body='body', status_id=1, category_id=1,
+                issue_type_id=1, gluu_server='3.1.4', os='Ubuntu',
+                created_by=self.community_user
+            )
+        self.assertEqual(ticket.slug, 'title-3')
+
+    def test_ticket_counters(self):
+        """
+         - vote and subscribe ticket
+         - answer ticket
+         - report drifted counters
+         - reconcile drifted counters
+        """
+        ticket = self.ticket_by_community_user
+
+        # vote and subscribe ticket
+        self.assertTrue(ticket.add_voter(self.community_user))
+        self.assertFalse(ticket.add_voter(self.community_user))
+        self.assertTrue(ticket.add_voter(self.manager))
+        self.assertTrue(ticket.remove_voter(self.manager))
+        self.assertFalse(ticket.remove_voter(self.manager))
+        self.assertTrue(ticket.add_subscriber(self.community_user))
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.vote_no, 1)
+        self.assertEqual(ticket.subscriber_no, 1)
+
+        # answer ticket
+        answer = Answer.objects.create(
+            ticket=ticket, body='body', created_by=self.manager
+        )
+        Answer.objects.create(
+            ticket=ticket, body='body', created_by=self.manager
+        )
+        answer.is_deleted = True
+        answer.save()
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.response_no, 1)
+
+        # report drifted counters
+        Ticket.objects.filter(pk=ticket.pk).update(
+            response_no=7, vote_no=7, subscriber_no=7, attachment_no=7
+        )
+        out = StringIO()
+        call_command('reconcile_ticket_counters', '--dry-run', stdout=out)
+        self.assertEqual(out.getvalue(), '1 tickets have drifted counters\n')
+        ticket.refresh_from_db()
+        self.assertEqual(ticket.vote_no, 7)
+
+        # reconcile drifted counters
+        out = StringIO()
+        call_command('reconcile_ticket_counters', stdout=out)
+        self.assertEqual(out.getvalue(), 'Reconciled counters of 1 tickets\n')
+        ticket.refresh_from_db()
+        self.assertEqual(
+            [ticket.response_no, ticket.vote_no, ticket.subscriber_no,
+             ticket.attachment_no],
+            [1, 1, 1, 0]
+        )
+
+    def test_chunked_upload(self):
+        """
+         - upload a file in chunks
+         - hash the upload once its last chunk is written
+         - refuse a chunk at the wrong offset
+         - attach the complete upload to a ticket without reading it again
+         - store the same file once
+         - keep the file name of each upload of the same file
+         - keep the upload when attaching it fails
+         - refuse an upload attached concurrently
+        """
+        upload_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, upload_root)
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Token ' + self.community_user.token
+        )
+        content = b'0123456789' * 100
+
+        def upload_file(filename='oxauth.log'):
+            response = self.client.post(
+                reverse('tickets:upload-list'),
+                data=json.dumps(
+                    {'upload': {'filename': filename, 'size': 1000}}
+                ),
+                content_type='application/json'
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            upload_id = response.data['results']['id']
+
+            for offset in range(0, 1000, 400):
+                response = self.client.put(
+                    reverse('tickets:upload-detail', args=[upload_id]) +
+                    '?offset={}'.format(offset),
+                    data=content[offset:offset + 400],
+                    content_type='application/octet-stream'
+                )
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return upload_id
+
+        with self.settings(
+            MEDIA_ROOT=os.path.join(upload_root, 'media'),
+            UPLOAD_SESSION_ROOT=os.path.join(upload_root, 'uploads')
+        ):
+            # upload a file in chunks
+            upload_id = upload_file()
+            upload = UploadSession.objects.get(pk=upload_id)
+            self.assertEqual(upload.offset, 1000)
+
+            # hash the upload once its last chunk is written
+            self.assertEqual(
+                upload.sha256, hashlib.sha256(content).hexdigest()
+            )
+
+            # refuse a chunk at the wrong offset
+            response = self.client.put(
+                reverse('tickets:upload-detail', args=[upload_id]) +
+                '?offset=400',
+                data=content[400:800],
+                content_type='application/octet-stream'
+            )
+            self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+            self.assertEqual(response.data['results']['offset'], 1000)
+
+            # attach the complete upload to a ticket without reading it again
+            with mock.patch('tickets.uploads.get_sha256') as get_sha256:
+                response = self.client.put(
+                    reverse(
+                        'tickets:ticket-upload',
+                        args=[self.ticket_by_community_user.slug]
+                    ),
+                    data=json.dumps({'uploads': [upload_id]}),
+                    content_type='application/json'
+                )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            get_sha256.assert_not_called()
+            self.assertTrue(os.path.samefile(
+                Document.objects.get().file.path, upload.path
+            ))
+            document = Document.objects.get()
+            self.assertEqual(document.file.read(), content)
+            self.assertFalse(UploadSession.objects.exists())
+
+            # store the same file once
+            upload_id = upload_file()
+            self.client.put(
+                reverse(
+                    'tickets:ticket-upload',
+                    args=[self.ticket_by_community_user.slug]
+                ),
+                data=json.dumps({'uploads': [upload_id]}),
+                content_type='application/json'
+            )
+            self.assertEqual(Document.objects.count(), 1)
+            self.assertEqual(
+                Attachments.objects.filter(document=document).count(), 2
+            )
+
+            # keep the file name of each upload of the same file
+            self.client.credentials(
+                HTTP_AUTHORIZATION='Token ' + self.manager.token
+            )
+            upload_id = upload_file('idp.log')
+            response = self.client.put(
+                reverse(
+                    'tickets:ticket-upload',
+                    args=[self.ticket_by_gluu_admin.slug]
+                ),
+                data=json.dumps({'uploads': [upload_id]}),
+                content_type='application/json'
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            response = self.client.get(reverse(
+                'tickets:ticket-attachments-list',
+                args=[self.ticket_by_gluu_admin.slug]
+            ))
+            self.assertEqual(
+                [attachment['filename'] for attachment in response.data[
+                    'results'
+                ]],
+                ['idp.log']
+            )
+            response = self.client.get(reverse(
+                'tickets:ticket-attachments-detail',
+                args=[
+                    self.ticket_by_gluu_admin.slug,
+                    response.data['results'][0]['id']
+                ]
+            ))
+            self.assertEqual(
+                response['Content-Disposition'],
+                'attachment; filename="idp.log"'
+            )
+            self.assertEqual(Document.objects.count(), 1)
+
+            # keep the upload when attaching it fails
+            upload_id = upload_file()
+            upload = UploadSession.objects.get(pk=upload_id)
+            with mock.patch.object(
+                    Attachments.objects, 'bulk_create',
+                    side_effect=DatabaseError):
+                with self.assertRaises(DatabaseError):
+                    self.client.put(
+                        reverse(
+                            'tickets:ticket-upload',
+                            args=[self.ticket_by_gluu_admin.slug]
+                        ),
+                        data=json.dumps({'uploads': [upload_id]}),
+                        content_type='application/json'
+                    )
+            self.assertTrue(UploadSession.objects.filter(pk=upload_id))
+            self.assertTrue(os.path.exists(upload.path))
+
+            # refuse an upload attached concurrently
+            UploadSession.objects.filter(pk=upload_id).delete()
+            with self.assertRaises(ValidationError):
+                attach_uploads([upload])
+
+    def test_download_attachment(self):
+        """
+         - download an attachment of a company ticket by unauthorized user
+         - download an attachment by company user
+         - download a byte range of an attachment
+         - download past the end of an attachment
+         - hand the download over to the front-end server
+        """
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+
+        with self.settings(MEDIA_ROOT=media_root):
+            document = Document.objects.create()
+            document.file.save('oxauth.log', ContentFile(b'0123456789'))
+            attachment = Attachments.objects.create(
+                document=document,
+                ticket=self.ticket_by_gluu_admin,
+                filename='oxauth.log'
+            )
+            url = reverse(
+                'tickets:ticket-attachments-detail',
+                args=[self.ticket_by_gluu_admin.slug, attachment.id]
+            )
+
+            # download an attachment of a company ticket by unauthorized user
+            self.client.credentials(
+                HTTP_AUTHORIZATION='Token ' + self.openiam_user.token
+            )
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+            # download an attachment by company user
+            self.client.credentials(
+                HTTP_AUTHORIZATION='Token ' + self.gluu_user.token
+            )
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(
+                b''.join(response.streaming_content), b'0123456789'
+            )
+            self.assertEqual(
+                response['Content-Disposition'],
+                'attachment; filename="oxauth.log"'
+            )
+
+            # download a byte range of an attachment
+            response = self.client.get(url, HTTP_RANGE='bytes=2-5')
+            self.assertEqual(
+                response.status_code, status.HTTP_206_PARTIAL_CONTENT
+            )
+            self.assertEqual(b''.join(response.streaming_content), b'2345')
+            self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+
+            response = self.client.get(url, HTTP_RANGE='bytes=-3')
+            self.assertEqual(b''.join(response.streaming_content), b'789')
+
+            # download past the end of an attachment
+            response = self.client.get(url, HTTP_RANGE='bytes=10-')
+            self.assertEqual(
+                response.status_code,
+                status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+            )
+
+            # hand the download over to the front-end server
+            with self.settings(SENDFILE_BACKEND='nginx'):
+                response = self.client.get(url)
+            self.assertEqual(
+                response['X-Accel-Redirect'], '/protected/oxauth.log'
+            )
+            self.assertEqual(response.content, b'')
+
     def test_create_company_ticket(self):
         """
          - create company ticket by non permission users
@@ -430,6 +1090,184 @@ class TicketViewSetTest(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
+    def test_conditional_get_ticket(self):
+        """
+         - revalidate an unchanged ticket list and ticket
+         - revalidate a ticket after it changed
+         - revalidate a ticket after its voters changed
+         - revalidate a company ticket by unauthorized user
+        """
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Token ' + self.gluu_admin.token
+        )
+        url = reverse(
+            'tickets:ticket-detail', args=[self.ticket_by_gluu_admin.slug]
+        )
+
+        # revalidate an unchanged ticket list and ticket
+        response = self.client.get(reverse('tickets:ticket-list'))
+        response = self.client.get(
+            reverse('tickets:ticket-list'),
+            HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertNotIn('Last-Modified', response)
+
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertIn('Last-Modified', response)
+
+        # revalidate a ticket after it changed
+        Answer.objects.create(
+            ticket=self.ticket_by_gluu_admin, body='body',
+            created_by=self.gluu_admin
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results']['response_no'], 1)
+
+        # revalidate a ticket after its voters changed
+        ticket = self.ticket_by_gluu_admin
+        ticket.add_voter(self.gluu_named)
+        etag = self.client.get(url)['ETag']
+        list_etag = self.client.get(reverse('tickets:ticket-list'))['ETag']
+        updated_at = Ticket.objects.get(pk=ticket.pk).updated_at
+        ticket.remove_voter(self.gluu_named)
+        ticket.add_voter(self.gluu_user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [voter['id'] for voter in response.data['results']['voters']],
+            [self.gluu_user.id]
+        )
+        response = self.client.get(
+            reverse('tickets:ticket-list'), HTTP_IF_NONE_MATCH=list_etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            Ticket.objects.get(pk=ticket.pk).updated_at, updated_at
+        )
+
+        # revalidate a company ticket by unauthorized user
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Token ' + self.openiam_user.token
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_list_company_tickets_queries(self):
+        """
+         - load the relations of nested serializers
+         - list company tickets in as many queries however many there are
+        """
+        # load the relations of nested serializers
+        self.assertEqual(
+            get_eager_relations(User, UserAssociationSerializer()),
+            ([], ['membership_set', 'membership_set__company'])
+        )
+
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Token ' + self.manager.token
+        )
+        query_counts = []
+
+        # list company tickets in as many queries however many there are
+        for ticket_count in [1, 5]:
+            for number in range(ticket_count):
+                company, named = [
+                    (self.gluu, self.gluu_named),
+                    (self.openiam, self.openiam_named)
+                ][number % 2]
+                ticket = Ticket.objects.create(
+                    title='title', body='body', status_id=1, category_id=1,
+                    issue_type_id=1, gluu_server='3.1.4', os='Ubuntu',
+                    created_by=self.staff, company_association=company,
+                    created_for=named, assignee=self.staff,
+                    updated_by=self.staff
+                )
+                ticket.voters.add(named)
+                ticket.subscribers.add(named, self.staff)
+
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('tickets:ticket-list'))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            query_counts.append(len(queries))
+
+        self.assertEqual(query_counts[0], query_counts[1])
+        self.assertEqual(
+            {
+                ticket['companyAssociation']['name']
+                for ticket in response.json()['results']
+                if ticket['companyAssociation']
+            },
+            {'Gluu', 'OpenIAM'}
+        )
+
+    def test_ticket_thread(self):
+        """
+         - get ticket thread by unauthorized user
+         - get ticket thread by company user
+         - get ticket thread with 1, 10 and 100 answers in as many queries
+        """
+        ticket = self.ticket_by_gluu_admin
+        url = reverse('tickets:ticket-thread', args=[ticket.slug])
+        document = Document.objects.create(file='attachments/log.txt')
+        Attachments.objects.create(
+            document=document, ticket=ticket, filename='log.txt'
+        )
+        TicketHistory.objects.create(
+            ticket=ticket,
+            changed_by=self.gluu_admin,
+            changes={'title': ['title', 'new title']}
+        )
+
+        # get ticket thread by unauthorized user
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Token ' + self.openiam_user.token
+        )
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        # get ticket thread by company user
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Token ' + self.gluu_named.token
+        )
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.json()['results']
+        self.assertEqual(results['ticket']['slug'], ticket.slug)
+        self.assertEqual(results['attachments'][0]['filename'], 'log.txt')
+        self.assertEqual(results['answers']['results'], [])
+        self.assertEqual(results['history'][0]['changedField'], 'title')
+        self.assertEqual(results['capabilities'], {
+            'respond': True, 'update': True, 'assign': False,
+            'delete': True
+        })
+
+        # get ticket thread with 1, 10 and 100 answers in as many queries
+        for total in [1, 10, 100]:
+            for _ in range(total - ticket.answers.count()):
+                answer = Answer.objects.create(
+                    ticket=ticket, body='body', created_by=self.gluu_admin
+                )
+                Attachments.objects.create(
+                    document=document, answer=answer, filename='log.txt'
+                )
+
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, {'limit': 100})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            answers = response.data['results']['answers']
+            self.assertEqual(answers['count'], total)
+            self.assertEqual(len(answers['results']), total)
+            self.assertEqual(
+                answers['results'][0]['attachments'][0]['filename'],
+                'log.txt'
+            )
+            self.assertEqual(len(queries), 11)
+
     def test_retrieve_company_ticket(self):
         """
          - retrieve company ticket by non permission users
@@ -631,6 +1469,109 @@ class TicketViewSetTest(APITestCase):
             )
             self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_ticket_history_records(self):
+        """
+         - write no record for a save rolled back
+         - write the records of a transaction with one INSERT
+         - expand records to an entry per changed field
+         - page through records
+        """
+        ticket = self.ticket_by_community_user
+
+        # write no record for a save rolled back
+        with capture_on_commit_callbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    ticket.title = 'Rolled back'
+                    ticket.save()
+                    raise DatabaseError
+            except DatabaseError:
+                pass
+        self.assertFalse(TicketHistory.objects.exists())
+        self.assertFalse(get_open_batches())
+
+        # write the records of a transaction with one INSERT
+        ticket = Ticket.objects.get(pk=ticket.pk)
+        with capture_on_commit_callbacks() as callbacks:
+            with transaction.atomic():
+                ticket.title = 'Oxauth crashes'
+                ticket.status_id = 2
+                ticket.updated_by = self.staff
+                ticket.save()
+                Answer.objects.create(
+                    ticket=ticket, body='Restart oxauth',
+                    created_by=self.staff
+                )
+        batches = [
+            callback for callback in callbacks
+            if isinstance(callback, HistoryBatch)
+        ]
+        self.assertEqual(len(batches), 1)
+        with CaptureQueriesContext(connection) as queries:
+            batches[0]()
+        self.assertEqual(len(queries), 1)
+        self.assertFalse(get_open_batches())
+        self.assertEqual(
+            sorted(
+                TicketHistory.objects.filter(
+                    ticket=ticket
+                ).values_list('changes', flat=True),
+                key=len
+            ),
+            [
+                {'answer': [None, 'Restart oxauth']},
+                {'title': ['title', 'Oxauth crashes'], 'status': [1, 2]}
+            ]
+        )
+
+        # expand records to an entry per changed field
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Token ' + self.manager.token
+        )
+        url = reverse('tickets:ticket-history', kwargs={'slug': ticket.slug})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [
+                entry['changedField']
+                for entry in response.json()['results']
+            ],
+            ['answer', 'status', 'title']
+        )
+        entry = response.json()['results'][1]
+        self.assertEqual(
+            {key: value for key, value in entry.items() if key != 'createdAt'},
+            {
+                'id': TicketHistory.objects.get(
+                    ticket=ticket, changes__has_key='status'
+                ).id,
+                'ticket': ticket.id,
+                'changedBy': self.staff.id,
+                'changedField': 'status',
+                'beforeValue': '1',
+                'afterValue': '2'
+            }
+        )
+
+        # page through records
+        response = self.client.get(url, {'limit': 1})
+        self.assertEqual(response.json()['count'], 2)
+        self.assertEqual(
+            [
+                entry['changedField']
+                for entry in response.json()['results']
+            ],
+            ['answer']
+        )
+        response = self.client.get(response.json()['next'])
+        self.assertEqual(
+            [
+                entry['changedField']
+                for entry in response.json()['results']
+            ],
+            ['status', 'title']
+        )
+
     def test_assign_for_community_ticket(self):
         """
          - assign for community ticket by non permission users
@@ -676,6 +1617,46 @@ class TicketViewSetTest(APITestCase):
             )
             self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_assign_notification(self):
+        """
+         - record the assignment once the ticket row is written
+         - mail the new assignee
+        """
+        ticket = self.ticket_by_community_user
+        url = reverse('tickets:ticket-assign', kwargs={'slug': ticket.slug})
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Token ' + self.manager.token
+        )
+
+        # record the assignment once the ticket row is written
+        assignees = []
+        with mock.patch(
+                'tickets.signals.record_event',
+                side_effect=lambda *args, **kwargs: assignees.append(
+                    Ticket.objects.get(pk=ticket.pk).assignee_id
+                )):
+            response = self.client.post(
+                url,
+                data=json.dumps(self.assign_for_community_ticket_payload),
+                content_type='application/json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(assignees, [self.staff.id])
+
+        # mail the new assignee
+        Ticket.objects.filter(pk=ticket.pk).update(assignee=None)
+        with mock.patch.object(update_search_index, 'apply_async'), \
+                capture_on_commit_callbacks(execute=True):
+            response = self.client.post(
+                url,
+                data=json.dumps(self.assign_for_community_ticket_payload),
+                content_type='application/json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [message.to for message in mail.outbox], [[self.staff.email]]
+        )
+
     def test_assign_for_company_ticket(self):
         """
          - assign for company ticket by non permission users
@@ -721,6 +1702,107 @@ class TicketViewSetTest(APITestCase):
             )
             self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_bulk_update_tickets(self):
+        """
+         - bulk update tickets by non permission user
+         - bulk update tickets by slug
+         - bulk update tickets by filter
+         - bulk update tickets with an invalid selection
+         - bulk update tickets with an empty filter
+        """
+        gluu_tickets = [
+            self.ticket_by_gluu_admin.slug, self.ticket_by_staff_for_gluu.slug
+        ]
+
+        # bulk update tickets by non permission user
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Token ' + self.gluu_user.token
+        )
+        response = self.client.post(
+            reverse('tickets:ticket-bulk'),
+            data=json.dumps({
+                'bulk': {'tickets': gluu_tickets, 'changes': {'status': 5}}
+            }),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(Ticket.objects.filter(status_id=5).exists())
+
+        # bulk update tickets by slug
+        self.client.credentials(
+            HTTP_AUTHORIZATION='Token ' + self.staff.token
+        )
+        with mock.patch('tickets.bulk.record_event') as record_event:
+            response = self.client.post(
+                reverse('tickets:ticket-bulk'),
+                data=json.dumps({
+                    'bulk': {
+                        'tickets': gluu_tickets,
+                        'changes': {'status': 5, 'assignee': self.staff.id}
+                    }
+                }),
+                content_type='application/json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data['results'], {'matched': 2, 'updated': 2}
+        )
+        self.assertEqual(
+            list(Ticket.objects.filter(
+                status_id=5, assignee=self.staff, updated_by=self.staff
+            ).values_list('slug', flat=True).order_by('id')),
+            gluu_tickets
+        )
+        record_event.assert_called_once()
+        self.assertEqual(
+            sorted(record_event.call_args[1]['ticket_ids']),
+            [self.ticket_by_gluu_admin.id, self.ticket_by_staff_for_gluu.id]
+        )
+
+        # bulk update tickets by filter
+        response = self.client.post(
+            reverse('tickets:ticket-bulk'),
+            data=json.dumps({
+                'bulk': {
+                    'filter': {'companyAssociation': self.gluu.id},
+                    'changes': {'status': 5, 'category': 2}
+                }
+            }),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data['results'], {'matched': 2, 'updated': 2}
+        )
+        self.assertEqual(
+            Ticket.objects.filter(category_id=2).count(), 2
+        )
+
+        # bulk update tickets with an invalid selection
+        response = self.client.post(
+            reverse('tickets:ticket-bulk'),
+            data=json.dumps({
+                'bulk': {
+                    'tickets': gluu_tickets,
+                    'filter': {'status': 1},
+                    'changes': {'status': 5}
+                }
+            }),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # bulk update tickets with an empty filter
+        response = self.client.post(
+            reverse('tickets:ticket-bulk'),
+            data=json.dumps({
+                'bulk': {'filter': {}, 'changes': {'status': 1}}
+            }),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Ticket.objects.filter(status_id=5).count(), 2)
+
 
 class AnswerViewSetTest(APITestCase):
 
@@ -1365,3 +2447,110 @@ class AnswerViewSetTest(APITestCase):
             else:
                 expected = status.HTTP_404_NOT_FOUND
             self.assertEqual(response.status_code, expected)
+
+
+class TicketHistoryMigrationTest(TransactionTestCase):
+    fixtures = ['data']
+
+    def test_convert_history_records(self):
+        """
+         - convert a record of one field to a record of its changes
+        """
+        executor = MigrationExecutor(connection)
+        target = [('tickets', '0006_ticket_search_vector')]
+        executor.migrate(target)
+        self.addCleanup(call_command, 'migrate', verbosity=0)
+
+        apps = executor.loader.project_state(target).apps
+        user = apps.get_model('profiles', 'User').objects.create(
+            email='staff@gmail.com', password='staff'
+        )
+        ticket = apps.get_model('tickets', 'Ticket').objects.create(
+            title='title', body='body', status_id=1, category_id=1,
+            issue_type_id=1, gluu_server='3.1.4', os='Ubuntu',
+            created_by=user
+        )
+        history = apps.get_model('tickets', 'TicketHistory').objects.create(
+            ticket=ticket, changed_by=user, changed_field='status',
+            before_value='1', after_value='2'
+        )
+
+        # convert a record of one field to a record of its changes
+        call_command('migrate', 'tickets', verbosity=0)
+        self.assertEqual(
+            TicketHistory.objects.get(pk=history.pk).changes,
+            {'status': ['1', '2']}
+        )
+
+
+class RebuildTicketIndexTest(TransactionTestCase):
+    fixtures = ['data']
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@gmail.com',
+            password='levan'
+        )
+        # Without signals, whose on_commit tasks would need a broker
+        Ticket.objects.bulk_create([
+            Ticket(
+                title='title', body='body', slug='title-{}'.format(number),
+                status_id=1, category_id=1, issue_type_id=1,
+                gluu_server='3.1.4', os='Ubuntu', created_by=self.user
+            )
+            for number in range(3)
+        ])
+        self.ticket_ids = sorted(
+            Ticket.objects.values_list('id', flat=True)
+        )
+
+    def rebuild(self, **options):
+        call_command(
+            'rebuild_ticket_index', workers=1, chunk_size=1, **options
+        )
+
+    def indexed(self):
+        return sorted(
+            int(result.pk) for result in SearchQuerySet().models(Ticket)
+        )
+
+    def test_resume_rebuild(self):
+        """
+         - interrupt a rebuild after one chunk
+         - resume the rebuild with the chunks left
+         - interrupt a rebuild while a chunk is merged
+         - resume the rebuild without the merged chunk
+        """
+        ticket_ids = self.ticket_ids
+
+        with search_index():
+            # interrupt a rebuild after one chunk
+            merge_chunk = RebuildCommand.merge_chunk
+            merged = []
+
+            def merge_once(command, *args):
+                if merged:
+                    raise KeyboardInterrupt
+                merge_chunk(command, *args)
+                merged.append(args)
+
+            with mock.patch.object(RebuildCommand, 'merge_chunk', merge_once):
+                with self.assertRaises(KeyboardInterrupt):
+                    self.rebuild()
+            self.assertEqual(len(self.indexed()), 1)
+
+            # resume the rebuild with the chunks left
+            self.rebuild(resume=True)
+            self.assertEqual(self.indexed(), ticket_ids)
+
+            # interrupt a rebuild while a chunk is merged
+            with mock.patch(
+                    'tickets.management.commands.rebuild_ticket_index.'
+                    'clean_files', side_effect=KeyboardInterrupt):
+                with self.assertRaises(KeyboardInterrupt):
+                    self.rebuild()
+            self.assertEqual(len(self.indexed()), 1)
+
+            # resume the rebuild without the merged chunk
+            self.rebuild(resume=True)
+            self.assertEqual(self.indexed(), ticket_ids)
@@ -0,0 +1,136 @@
+import hashlib
+import os
+from functools import partial
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from rest_framework.exceptions import ValidationError
+from tickets import constants
+from tickets.models import Document, UploadSession
+
+
+def get_sha256(f):
+    digest = hashlib.sha256()
+    for chunk in f.chunks(constants.UPLOAD_BLOCK_SIZE):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def save_document(sha256, store):
+    """
+    Document of the given SHA-256, the existing one when there is one, or a
+    new one whose file is put in storage by store
+    """
+    document = Document.objects.filter(sha256=sha256).first()
+    if document is not None:
+        return document
+
+    document = Document(sha256=sha256)
+    store(document)
+    try:
+        with transaction.atomic():
+            document.save()
+    except IntegrityError:
+        # The same content was stored concurrently
+        document.file.delete(save=False)
+        document = Document.objects.get(sha256=sha256)
+
+    return document
+
+
+def store_document(f, name):
+    """
+    Document holding the content of file f, reusing the document with the
+    same SHA-256 when there is one instead of storing the content again
+    """
+    if not f.size:
+        raise ValidationError('The submitted file is empty.')
+
+    return save_document(
+        get_sha256(f),
+        lambda document: document.file.save(name, f, save=False)
+    )
+
+
+def link_upload_file(upload, document):
+    """
+    Put the file of a completed upload in storage as the document's file.
+    It is hard linked rather than copied, so the upload keeps its file
+    until the transaction attaching it commits.
+    """
+    name = default_storage.get_available_name(
+        document.file.field.generate_filename(document, upload.filename)
+    )
+    path = default_storage.path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.link(upload.path, path)
+    document.file.name = name
+
+
+def append_chunk(upload, stream, length):
+    """
+    Stream length bytes of the request body to the end of the upload's
+    file, without holding more than a block in memory
+    """
+    os.makedirs(os.path.dirname(upload.path), exist_ok=True)
+    with open(upload.path, 'ab') as f:
+        # Bytes of an interrupted request past the recorded offset
+        f.truncate(upload.offset)
+
+        remaining = length
+        while remaining:
+            block = stream.read(min(remaining, constants.UPLOAD_BLOCK_SIZE))
+            if not block:
+                break
+            f.write(block)
+            remaining -= len(block)
+
+        upload.offset = f.tell()
+
+
+def hash_upload(upload):
+    """
+    Record the SHA-256 of a completed upload. Called once its last chunk
+    is written, out of the transaction locking the session, so attaching
+    the upload does not read the file again.
+    """
+    with open(upload.path, 'rb') as f:
+        upload.sha256 = get_sha256(File(f))
+    UploadSession.objects.filter(pk=upload.pk).update(sha256=upload.sha256)
+
+
+def remove_upload_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def attach_uploads(uploads):
+    """
+    (document, filename) of completed upload sessions, which are deleted.
+    To be called in a transaction: the sessions stay locked until it ends
+    and their chunks are only removed once it commits.
+    """
+    locked = list(UploadSession.objects.select_for_update().filter(
+        pk__in=[upload.pk for upload in uploads]
+    ))
+    # Attached by a concurrent request in the meantime
+    if len(locked) != len(uploads):
+        raise ValidationError('Uploads must exist and be complete')
+
+    documents = []
+    for upload in locked:
+        # Completed by a request which failed before hashing it
+        if upload.sha256 is None:
+            hash_upload(upload)
+
+        document = save_document(
+            upload.sha256, partial(link_upload_file, upload)
+        )
+        documents.append((document, upload.filename))
+
+        transaction.on_commit(partial(remove_upload_file, upload.path))
+        upload.delete()
+
+    return documents
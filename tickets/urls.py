@@ -1,7 +1,10 @@
+from django.conf import settings
 from django.conf.urls import include, url
 from rest_framework_nested import routers
+from tickets import constants
 from tickets.views import (
-    TicketViewSet, AnswerViewSet, TicketSearchView
+    TicketViewSet, AnswerViewSet, TicketSearchView, TicketFullTextSearchView,
+    UploadViewSet, AttachmentViewSet
 )
 
 router = routers.SimpleRouter()
@@ -12,11 +15,24 @@ router.register(
 )
 
 router.register(
-    r'search',
-    TicketSearchView,
-    base_name="location-search"
+    r'uploads',
+    UploadViewSet,
+    base_name='upload'
 )
 
+if settings.TICKET_SEARCH_BACKEND == constants.POSTGRES_SEARCH:
+    router.register(
+        r'search',
+        TicketFullTextSearchView,
+        base_name="location-search"
+    )
+else:
+    router.register(
+        r'search',
+        TicketSearchView,
+        base_name="location-search"
+    )
+
 tickets_router = routers.NestedSimpleRouter(
     router,
     r'tickets',
@@ -29,6 +45,12 @@ tickets_router.register(
     base_name='ticket-answers'
 )
 
+tickets_router.register(
+    r'attachments',
+    AttachmentViewSet,
+    base_name='ticket-attachments'
+)
+
 urlpatterns = [
     url(r'^', include(router.urls)),
     url(r'^', include(tickets_router.urls)),
@@ -1,22 +1,329 @@
+from django.contrib.postgres.search import SearchRank
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import (
+    CharField, Count, F, Func, Max, OuterRef, Prefetch, Q, Subquery,
+    TextField, Value
+)
+from django.db.models.functions import Cast, Concat
 from django.shortcuts import get_object_or_404
 from rest_framework import viewsets, mixins, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.settings import api_settings
 from drf_haystack.viewsets import HaystackViewSet
 from drf_haystack.filters import HaystackAutocompleteFilter
+from drf_haystack.mixins import FacetMixin
 from tickets import models as m
 from tickets import serializers as s
 from tickets import permissions as p
-from gluru_backend.utils import get_tickets_query
-from info.models import UserRole
+from gluru_backend.utils import (
+    get_tickets_query, get_tickets_search_query, get_ticket_visibility,
+    get_tickets_permitted_query, get_user_version, get_etag, set_validators,
+    get_not_modified, eager_load
+)
+from gluru_backend.pagination import TimestampCursorPagination
+from tickets import constants
+from tickets.search import (
+    PrefixSearchQuery, narrow_facet, ticket_facet_counts
+)
+from tickets.autocomplete import title_index
+from tickets.bulk import update_tickets
+from tickets.downloads import serve_document
+from tickets.uploads import (
+    append_chunk, attach_uploads, hash_upload, store_document
+)
+
+
+UPLOAD_PARSERS = [MultiPartParser] + list(api_settings.DEFAULT_PARSER_CLASSES)
+
+
+def save_attachments(request, ticket_id, **target):
+    """
+    Attach the files of a multipart request, or the completed uploads
+    listed in `uploads`, to the ticket or answer given as target
+    """
+    documents = [
+        (store_document(f, f.name), f.name) for f in request.FILES.values()
+    ]
+
+    if not request.FILES:
+        serializer = s.AttachUploadsSerializer(
+            data=request.data,
+            context={'user': request.user}
+        )
+        serializer.is_valid(raise_exception=True)
+
+    with transaction.atomic():
+        if not request.FILES:
+            documents = attach_uploads(serializer.validated_data['uploads'])
+
+        m.Attachments.objects.bulk_create([
+            m.Attachments(document=document, filename=filename, **target)
+            for document, filename in documents
+        ])
+        m.Ticket.update_counters(ticket_id, attachment_no=len(documents))
+
+
+def get_selected_facets(request):
+    for facet in request.query_params.getlist('selected_facets'):
+        field, _, value = facet.partition(':')
+        if field.endswith('_exact'):
+            field = field[:-len('_exact')]
+        if field in constants.TICKET_FACETS and value:
+            yield field, value
+
+
+def get_facet_counts(view, backend, compute):
+    """
+    Facet counts of the current search. Counts of the unfiltered search
+    only depend on which tickets the user may see, so they are cached per
+    visibility for FACET_COUNTS_TIMEOUT seconds.
+    """
+    paginator = view.paginator
+    page_params = {
+        getattr(paginator, 'limit_query_param', None),
+        getattr(paginator, 'offset_query_param', None),
+    }
+    if any(key not in page_params for key in view.request.query_params):
+        return compute()
+
+    user = view.request.user
+    if not user.is_authenticated:
+        scope = 'public'
+    else:
+        company_ids = get_ticket_visibility(user)
+        if company_ids is None:
+            scope = 'all'
+        else:
+            scope = ','.join(str(pk) for pk in sorted(company_ids)) or 'none'
+
+    key = constants.FACET_COUNTS_KEY.format(backend, scope)
+    counts = cache.get(key)
+    if counts is None:
+        counts = compute()
+        cache.set(key, counts, constants.FACET_COUNTS_TIMEOUT)
 
+    return counts
 
-class TicketSearchView(HaystackViewSet):
+
+class TicketSearchView(FacetMixin, HaystackViewSet):
     index_models = [m.Ticket]
     serializer_class = s.TicketSearchSerializer
+    facet_serializer_class = s.TicketFacetSerializer
     filter_backends = [HaystackAutocompleteFilter]
 
+    def get_queryset(self, index_models=[]):
+        queryset = super().get_queryset(index_models)
+
+        # Visibility is a filter on indexed fields, so results the caller
+        # may not see are never fetched
+        visibility = get_tickets_search_query(self.request.user)
+        if visibility is not None:
+            queryset = queryset.filter(visibility)
+
+        return queryset
+
+    @action(detail=False, methods=['GET'])
+    def facets(self, request):
+        """
+        Results of the current search along with the count of every facet
+        value, computed by the search engine in the same query
+        """
+        queryset = self.filter_facet_queryset(
+            self.filter_queryset(self.get_queryset())
+        )
+
+        for field, value in get_selected_facets(request):
+            queryset = queryset.narrow('{}_exact:"{}"'.format(
+                field, queryset.query.clean(value)
+            ))
+
+        counts = get_facet_counts(
+            self,
+            backend=constants.HAYSTACK_SEARCH,
+            compute=queryset.facet_counts
+        )
+        serializer = self.get_facet_serializer(
+            counts,
+            objects=queryset,
+            many=False
+        )
+        return Response(serializer.data)
+
+
+class TicketFullTextSearchView(mixins.ListModelMixin,
+                               viewsets.GenericViewSet):
+    """
+    Ticket search on the PostgreSQL search vector, ranked by ts_rank.
+    Serves /search when TICKET_SEARCH_BACKEND is 'postgres'.
+    """
+    serializer_class = s.TicketFullTextSearchSerializer
+    queryset = m.Ticket.actives.all()
+
+    def get_queryset(self):
+        queryset = self.queryset.filter(
+            get_tickets_query(self.request.user)
+        )
+        query = PrefixSearchQuery(self.request.query_params.get('q', ''))
+
+        if not query.value:
+            return queryset.annotate(
+                highlighted=Value('', output_field=TextField())
+            ).order_by('-created_at')
+
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query),
+            highlighted=Func(
+                F('body'), query,
+                Value('StartSel=<strong>, StopSel=</strong>'),
+                function='ts_headline',
+                template="%(function)s('{}', %(expressions)s)".format(
+                    constants.SEARCH_CONFIG
+                ),
+                output_field=TextField()
+            )
+        ).order_by('-rank', '-id')
+
+    def get_facet_objects_serializer(self, *args, **kwargs):
+        return self.get_serializer(*args, **kwargs)
+
+    @action(detail=False, methods=['GET'])
+    def facets(self, request):
+        """
+        Same response as the facets of TicketSearchView, the counts being
+        computed by one query over the search results
+        """
+        queryset = self.get_queryset()
+        for field, value in get_selected_facets(request):
+            queryset = narrow_facet(queryset, field, value)
+
+        counts = get_facet_counts(
+            self,
+            backend=constants.POSTGRES_SEARCH,
+            compute=lambda: ticket_facet_counts(queryset)
+        )
+        serializer = s.TicketFacetSerializer(
+            counts,
+            context={
+                'request': request,
+                'view': self,
+                'objects': queryset,
+                'facet_query_params_text': 'selected_facets'
+            }
+        )
+        return Response(serializer.data)
+
+
+class UploadViewSet(viewsets.GenericViewSet):
+    """
+    Chunked, resumable file uploads. An upload is created with the file
+    name and size, then its content is sent as raw bytes by PUT requests
+    starting at ?offset=; GET tells how many bytes were received so far.
+    Complete uploads are attached with the upload actions of tickets and
+    answers.
+    """
+    permission_classes = (IsAuthenticated, )
+    serializer_class = s.UploadSessionSerializer
+
+    def get_queryset(self):
+        return m.UploadSession.objects.filter(created_by=self.request.user)
+
+    def create(self, request):
+        serializer = self.serializer_class(
+            data=request.data.get('upload', {})
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save(created_by=request.user)
+
+        return Response(
+            {'results': serializer.data},
+            status=status.HTTP_201_CREATED
+        )
+
+    def retrieve(self, request, pk=None):
+        serializer = self.serializer_class(self.get_object())
+
+        return Response(
+            {'results': serializer.data},
+            status=status.HTTP_200_OK
+        )
+
+    def update(self, request, pk=None):
+        try:
+            offset = int(request.query_params.get('offset', ''))
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return Response(
+                {'results': 'Invalid offset'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if not 0 < length <= constants.UPLOAD_CHUNK_MAX_SIZE:
+            return Response(
+                {'results': 'Chunks must be at most {} bytes'.format(
+                    constants.UPLOAD_CHUNK_MAX_SIZE
+                )},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        with transaction.atomic():
+            upload = get_object_or_404(
+                self.get_queryset().select_for_update(),
+                pk=pk
+            )
+
+            # The client resumes from the offset we have
+            if offset != upload.offset:
+                return Response(
+                    {'results': self.serializer_class(upload).data},
+                    status=status.HTTP_409_CONFLICT
+                )
+
+            if offset + length > upload.size:
+                return Response(
+                    {'results': 'Chunk exceeds the upload size'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            append_chunk(upload, request.stream, length)
+            upload.save(update_fields=['offset'])
+
+        if upload.is_complete:
+            hash_upload(upload)
+
+        return Response(
+            {'results': self.serializer_class(upload).data},
+            status=status.HTTP_200_OK
+        )
+
+
+def member_versions():
+    """
+    Newest id and count of the voters and of the subscribers of each
+    ticket, which change with every vote or subscription
+    """
+    versions = {}
+    for field, through in [
+            ('voters_version', m.Ticket.voters.through),
+            ('subscribers_version', m.Ticket.subscribers.through)]:
+        versions[field] = Subquery(
+            through.objects.filter(
+                ticket=OuterRef('pk')
+            ).order_by().values('ticket').annotate(
+                version=Concat(
+                    Cast(Max('id'), CharField()), Value(':'),
+                    Cast(Count('id'), CharField())
+                )
+            ).values('version'),
+            output_field=CharField()
+        )
+
+    return versions
+
 
 class TicketViewSet(mixins.CreateModelMixin,
                     mixins.ListModelMixin,
@@ -26,6 +333,7 @@ class TicketViewSet(mixins.CreateModelMixin,
                     viewsets.GenericViewSet):
     lookup_field = 'slug'
     permission_classes = (p.TicketCustomPermission, )
+    pagination_class = TimestampCursorPagination
     serializer_class = s.TicketSerializer
     queryset = m.Ticket.actives.select_related(
         'created_by', 'created_for', 'company_association', 'updated_by',
@@ -65,8 +373,27 @@ class TicketViewSet(mixins.CreateModelMixin,
         )
 
     def list(self, request):
+        queryset = self.get_queryset().filter(
+            get_tickets_query(self.request.user)
+        )
+
+        # Revalidating a page costs one query over its rows
+        rows = self.paginator.get_page_version(
+            queryset.annotate(**member_versions()), request,
+            constants.TICKET_VERSION_FIELDS +
+            constants.TICKET_MEMBER_VERSION_FIELDS
+        )
+        # No Last-Modified: rows leaving the page do not move the newest
+        # updated_at of the ones left
+        etag = get_etag(
+            get_user_version(request.user), request.get_full_path(), rows
+        )
+        not_modified = get_not_modified(request, etag)
+        if not_modified is not None:
+            return not_modified
+
         page = self.paginate_queryset(
-            self.get_queryset().filter(get_tickets_query(self.request.user))
+            eager_load(queryset, self.serializer_class)
         )
 
         serializer = self.serializer_class(
@@ -74,7 +401,10 @@ class TicketViewSet(mixins.CreateModelMixin,
             many=True
         )
 
-        return self.get_paginated_response(serializer.data)
+        return set_validators(
+            self.get_paginated_response(serializer.data),
+            etag
+        )
 
     def update(self, request, slug=None):
         serializer_instance = self.get_object()
@@ -96,38 +426,73 @@ class TicketViewSet(mixins.CreateModelMixin,
             status=status.HTTP_200_OK
         )
 
+    def get_version(self, slug):
+        """
+        Ticket of slug with only what tells whether its representation
+        changed, along with the answer, history, voter and subscriber
+        watermarks
+        """
+        ticket = get_object_or_404(
+            m.Ticket.actives.only(
+                'company_association', 'created_by',
+                *constants.TICKET_VERSION_FIELDS
+            ).annotate(
+                **member_versions()
+            ).annotate(
+                answered_at=Subquery(
+                    m.Answer.objects.filter(
+                        ticket=OuterRef('pk')
+                    ).order_by('-updated_at').values('updated_at')[:1]
+                ),
+                history_id=Subquery(
+                    m.TicketHistory.objects.filter(
+                        ticket=OuterRef('pk')
+                    ).order_by('-id').values('id')[:1]
+                )
+            ),
+            slug=slug
+        )
+        self.check_object_permissions(self.request, ticket)
+
+        return ticket
+
     def retrieve(self, request, slug=None):
+        version = self.get_version(slug)
+        etag = get_etag(
+            get_user_version(request.user),
+            [
+                getattr(version, field) for field in
+                constants.TICKET_VERSION_FIELDS +
+                constants.TICKET_MEMBER_VERSION_FIELDS
+            ],
+            version.answered_at,
+            version.history_id
+        )
+        last_modified = max(filter(None, [
+            version.updated_at, version.answered_at
+        ]))
+        not_modified = get_not_modified(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
         ticket = self.get_object()
         serializer = self.serializer_class(
             ticket,
         )
 
-        if ticket.company_association is None:
-            respond_permission = (request.user == ticket.created_by)
-
-        else:
-            membership = request.user.membership_set.filter(
-                company=ticket.company_association
-            ).first()
-            respond_permission = membership and membership.role and\
-                membership.role.has_permission(
-                    app_name='tickets', model_name='Answer', action='create'
-                )
-
-        if request.user.is_superuser:
-            respond_permission = True
-
-        if not request.user.is_superuser and request.user.is_staff:
-            staff_role = UserRole.objects.get(name='staff')
-            respond_permission = staff_role.has_permission(
-                app_name='tickets', model_name='Answer', action='create'
-            )
-        return Response(
-            {
-                'results': serializer.data,
-                'respond_permission': respond_permission
-            },
-            status=status.HTTP_200_OK
+        respond_permission = p.has_ticket_permission(
+            request.user, ticket, 'Answer', 'create'
+        )
+        return set_validators(
+            Response(
+                {
+                    'results': serializer.data,
+                    'respond_permission': respond_permission
+                },
+                status=status.HTTP_200_OK
+            ),
+            etag,
+            last_modified
         )
 
     def destroy(self, request, slug=None):
@@ -137,20 +502,142 @@ class TicketViewSet(mixins.CreateModelMixin,
 
         return Response(None, status=status.HTTP_204_NO_CONTENT)
 
+    @action(detail=False, methods=['GET'])
+    def autocomplete(self, request):
+        query = request.query_params.get('q', '')
+
+        if request.user.is_authenticated:
+            company_ids = get_ticket_visibility(request.user)
+            results = title_index.search(
+                query,
+                company_ids=set(company_ids) if company_ids is not None
+                else None
+            )
+        else:
+            results = title_index.search(query, public_only=True)
+
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['POST'])
+    def bulk(self, request):
+        """
+        Change the status, assignee, category or issue type of many tickets
+        at once. Nothing is changed unless the user may change every
+        selected ticket.
+        """
+        serializer = s.TicketBulkSerializer(data=request.data.get('bulk', {}))
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        tickets = m.Ticket.actives.filter(get_tickets_query(request.user))
+        if 'tickets' in data:
+            tickets = tickets.filter(slug__in=data['tickets'])
+        else:
+            tickets = tickets.filter(**data['filter'])
+
+        permitted = tickets
+        for action_name in {
+            'assign' if field == 'assignee' else 'update'
+            for field in data['changes']
+        }:
+            permitted = permitted.filter(
+                get_tickets_permitted_query(request.user, action_name)
+            )
+
+        total = tickets.count()
+        if total > constants.BULK_MAX_TICKETS:
+            return Response(
+                {'results': 'More than {} tickets selected'.format(
+                    constants.BULK_MAX_TICKETS
+                )},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if permitted.count() < total:
+            raise PermissionDenied(
+                'You do not have permission to change some of the tickets.'
+            )
+
+        ticket_ids = update_tickets(permitted, data['changes'], request.user)
+
+        return Response(
+            {'results': {'matched': total, 'updated': len(ticket_ids)}},
+            status=status.HTTP_200_OK
+        )
+
     @action(detail=True, methods=['GET'])
     def history(self, request, slug=None):
+        """
+        Pages of history records, newest first, each one expanded to an
+        entry per field changed by the save it records. limit and count
+        are in records, so a page may hold more entries than limit.
+        """
         serializer_instance = self.get_object()
         page = self.paginate_queryset(
             serializer_instance.history.all()
         )
 
-        serializer = s.TicketHistorySerializer(
-            page,
-            many=True
-        )
+        serializer = s.TicketHistoryListSerializer(page)
 
         return self.get_paginated_response(serializer.data)
 
+    @action(detail=True, methods=['GET'])
+    def thread(self, request, slug=None):
+        """
+        Ticket with its attachments, a page of its answers with their
+        authors and attachments, its latest history and what the user may
+        do with it, in the same number of queries however many answers
+        there are
+        """
+        attachments = m.Attachments.objects.order_by('id')
+
+        ticket = get_object_or_404(
+            eager_load(
+                self.get_queryset(), self.serializer_class
+            ).prefetch_related(
+                Prefetch('ticket_attachments', queryset=attachments)
+            ),
+            slug=slug
+        )
+        self.check_object_permissions(request, ticket)
+
+        answers = self.paginate_queryset(
+            m.Answer.actives.filter(
+                ticket=ticket
+            ).select_related(
+                'created_by'
+            ).prefetch_related(
+                Prefetch('answer_attachments', queryset=attachments)
+            )
+        )
+        history = ticket.history.order_by(
+            '-created_at', '-id'
+        )[:constants.THREAD_HISTORY_SIZE]
+
+        return Response(
+            {
+                'results': {
+                    'ticket': self.serializer_class(ticket).data,
+                    'attachments': s.AttachmentSerializer(
+                        ticket.ticket_attachments.all(),
+                        many=True
+                    ).data,
+                    'answers': self.get_paginated_response(
+                        s.AnswerThreadSerializer(answers, many=True).data
+                    ).data,
+                    'history': s.TicketHistoryListSerializer(history).data,
+                    'capabilities': {
+                        capability: p.has_ticket_permission(
+                            request.user, ticket, model_name, action_name
+                        )
+                        for capability, (model_name, action_name)
+                        in constants.THREAD_CAPABILITIES.items()
+                    }
+                }
+            },
+            status=status.HTTP_200_OK
+        )
+
     @action(detail=True, methods=['POST'])
     def assign(self, request, slug=None):
         serializer_instance = self.get_object()
@@ -179,11 +666,10 @@ class TicketViewSet(mixins.CreateModelMixin,
         data = request.data.get('vote', {})
         vote = data.get('vote', True)
         if vote:
-            ticket.voters.add(request.user)
+            ticket.add_voter(request.user)
             msg = 'You voted this ticket'
         else:
-            if request.user in ticket.voters.all():
-                ticket.voters.remove(request.user)
+            if ticket.remove_voter(request.user):
                 msg = 'You unvoted this ticket'
             else:
                 msg = 'You have not voted this ticket yet'
@@ -196,29 +682,20 @@ class TicketViewSet(mixins.CreateModelMixin,
         data = request.data.get('subscribe', {})
         subscribe = data.get('subscribe', True)
         if subscribe:
-            ticket.subscribers.add(request.user)
+            ticket.add_subscriber(request.user)
             msg = 'You are subscribed to this ticket'
         else:
-            if request.user in ticket.subscribers.all():
-                ticket.subscribers.remove(request.user)
+            if ticket.remove_subscriber(request.user):
                 msg = 'You are unsubscribed to this ticket'
             else:
                 msg = 'You are not subscribed to this ticket yet'
 
         return Response({'results': msg}, status=status.HTTP_200_OK)
 
-    @action(detail=True, methods=['PUT'], parser_classes=[MultiPartParser])
+    @action(detail=True, methods=['PUT'], parser_classes=UPLOAD_PARSERS)
     def upload(self, request, slug=None):
         obj = self.get_object()
-        files = list(request.FILES.values())
-        for f in files:
-            serializer = s.DocumentSerializer(data={"file": f})
-            serializer.is_valid(raise_exception=True)
-            document = serializer.save()
-            m.Attachments.objects.create(
-                document=document,
-                ticket=obj
-            )
+        save_attachments(request, obj.pk, ticket=obj)
 
         return Response(
             {'results': 'Successfully uploaded'},
@@ -233,13 +710,38 @@ class AnswerViewSet(mixins.CreateModelMixin,
                     mixins.DestroyModelMixin,
                     viewsets.GenericViewSet):
     permission_classes = (p.AnswerCustomPermission, )
+    pagination_class = TimestampCursorPagination
     serializer_class = s.AnswerSerializer
 
     def get_queryset(self):
-        return m.Answer.actives.filter(
+        queryset = m.Answer.actives.filter(
             ticket__slug=self.kwargs['ticket_slug'],
             ticket__is_deleted=False
         )
+        return eager_load(queryset, self.serializer_class)
+
+    def list(self, request, ticket_slug=None):
+        queryset = self.get_queryset()
+
+        rows = self.paginator.get_page_version(
+            queryset, request, constants.ANSWER_VERSION_FIELDS
+        )
+        etag = get_etag(
+            get_user_version(request.user), request.get_full_path(), rows
+        )
+        not_modified = get_not_modified(request, etag)
+        if not_modified is not None:
+            return not_modified
+
+        serializer = self.serializer_class(
+            self.paginate_queryset(queryset),
+            many=True
+        )
+
+        return set_validators(
+            self.get_paginated_response(serializer.data),
+            etag
+        )
 
     def create(self, request, ticket_slug=None):
         serializer_data = request.data.get('answer', {})
@@ -284,13 +786,29 @@ class AnswerViewSet(mixins.CreateModelMixin,
 
     def retrieve(self, request, ticket_slug=None, pk=None):
         serializer_instance = self.get_object()
+        etag = get_etag(
+            get_user_version(request.user),
+            [
+                getattr(serializer_instance, field)
+                for field in constants.ANSWER_VERSION_FIELDS
+            ]
+        )
+        last_modified = serializer_instance.updated_at
+        not_modified = get_not_modified(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
         serializer = self.serializer_class(
             serializer_instance,
         )
 
-        return Response(
-            {'results': serializer.data},
-            status=status.HTTP_200_OK
+        return set_validators(
+            Response(
+                {'results': serializer.data},
+                status=status.HTTP_200_OK
+            ),
+            etag,
+            last_modified
         )
 
     def destroy(self, request, ticket_slug=None, pk=None):
@@ -300,20 +818,58 @@ class AnswerViewSet(mixins.CreateModelMixin,
 
         return Response(None, status=status.HTTP_204_NO_CONTENT)
 
-    @action(detail=True, methods=['PUT'], parser_classes=[MultiPartParser])
+    @action(detail=True, methods=['PUT'], parser_classes=UPLOAD_PARSERS)
     def upload(self, request, ticket_slug=None, pk=None):
         obj = self.get_object()
-        files = list(request.FILES.values())
-        for f in files:
-            serializer = s.DocumentSerializer(data={"file": f})
-            serializer.is_valid(raise_exception=True)
-            document = serializer.save()
-            m.Attachments.objects.create(
-                document=document,
-                answer=obj
-            )
+        save_attachments(request, obj.ticket_id, answer=obj)
 
         return Response(
             {'results': 'Successfully uploaded'},
             status=status.HTTP_200_OK
         )
+
+
+class AttachmentViewSet(mixins.ListModelMixin,
+                        mixins.RetrieveModelMixin,
+                        viewsets.GenericViewSet):
+    """
+    Files attached to a ticket and its answers, for whoever may see the
+    ticket. Retrieving an attachment downloads its file.
+    """
+    pagination_class = None
+    serializer_class = s.AttachmentSerializer
+
+    def get_queryset(self):
+        ticket = get_object_or_404(
+            m.Ticket.actives.filter(get_tickets_query(self.request.user)),
+            slug=self.kwargs['ticket_slug']
+        )
+        return m.Attachments.objects.filter(
+            Q(ticket=ticket) |
+            Q(answer__ticket=ticket, answer__is_deleted=False)
+        ).select_related('document').order_by('id')
+
+    def perform_content_negotiation(self, request, force=False):
+        # Downloads are files whatever the client accepts
+        return super().perform_content_negotiation(
+            request,
+            force=force or self.action == 'retrieve'
+        )
+
+    def list(self, request, ticket_slug=None):
+        serializer = self.serializer_class(
+            self.get_queryset(),
+            many=True
+        )
+
+        return Response(
+            {'results': serializer.data},
+            status=status.HTTP_200_OK
+        )
+
+    def retrieve(self, request, ticket_slug=None, pk=None):
+        attachment = self.get_object()
+
+        return serve_document(
+            request, attachment.document, attachment.filename
+        )